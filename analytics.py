@@ -0,0 +1,278 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from kivy.logger import Logger
+
+CACHE_FOLDER = 'data/analytics_cache'
+# Per-line columns, all int64 and sorted by order_id. ``item`` indexes
+# SalesData.item_names; ``dow`` is 0 = Sunday and ``dow``/``hour`` are local time.
+COLUMNS = ('order_id', 'ts', 'dow', 'hour', 'item', 'quantity', 'cents')
+DAY_NAMES = ('Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat')
+# Upper bound on the cells in one order x item block when counting co-occurrence.
+CO_OCCURRENCE_BLOCK = 4_000_000
+
+_LINES_SQL = """
+    SELECT oi.order_id, CAST(strftime('%s', o.created_at) AS INTEGER),
+           oi.menu_item_id, oi.item_name, oi.quantity, oi.line_total
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    ORDER BY oi.order_id
+"""
+
+# Newest change_log entry that can alter a report. Inventory changes and
+# kitchen status updates to orders happen all through service but change
+# nothing reported here, so they leave the cache valid.
+_SALES_CHANGE_SQL = """
+    SELECT seq FROM change_log
+    WHERE table_name IN ('order_items', 'menu_items', 'categories')
+       OR (table_name = 'orders' AND op != 'update')
+    ORDER BY seq DESC
+    LIMIT 1
+"""
+
+_CATEGORIES_SQL = """
+    SELECT m.id, COALESCE(c.name, '')
+    FROM menu_items m
+    LEFT JOIN categories c ON c.id = m.category_id
+"""
+
+
+def sales_change_seq(db):
+    """Cache key for SalesData: the newest change that affects sales reports."""
+    with db.connection() as conn:
+        row = conn.execute(_SALES_CHANGE_SQL).fetchone()
+    # If pruning removed every such entry, the overall sequence (never reused) stands in.
+    return row[0] if row else db.latest_change_seq()
+
+
+def _local_day_and_hour(ts):
+    """Local day of week (0 = Sunday) and hour for Unix timestamps.
+
+    Much cheaper than strftime(..., 'localtime') per row in SQL: the UTC
+    offset is looked up once per distinct hour, which also follows DST.
+    """
+    hours, inverse = np.unique(ts // 3600, return_inverse=True)
+    offsets = np.array([time.localtime(int(h) * 3600).tm_gmtoff for h in hours], dtype=np.int64)
+    local = ts + offsets[inverse].reshape(ts.shape)
+    # 1970-01-01 was a Thursday.
+    return (local // 86400 + 4) % 7, local // 3600 % 24
+
+
+class SalesData:
+    """Order lines as parallel NumPy columns, with vectorized sales reports.
+
+    ``load`` reads every order line with one query. Lines are grouped by
+    menu item id, since two menu items may share a name; lines whose item
+    was deleted fall back to grouping by the name saved with the order, so
+    they still count. The columns can be kept as .npy files that are
+    memory-mapped on the next load, as long as the change log shows no
+    change since that affects sales (see sales_change_seq). Each cache lives in its
+    own ``seq-N`` directory and is never rewritten in place, since another
+    executor worker may have its files mapped.
+    """
+
+    def __init__(self, columns, item_names, categories):
+        self.columns = columns
+        self.item_names = item_names
+        self.categories = categories
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.order_id)
+
+    @classmethod
+    def load(cls, db, cache_folder=CACHE_FOLDER):
+        seq = sales_change_seq(db)
+        if cache_folder:
+            data = cls._load_cache(cache_folder, seq)
+            if data is not None:
+                return data
+        data = cls._read(db)
+        if cache_folder:
+            data._save_cache(cache_folder, seq)
+        return data
+
+    @classmethod
+    def _read(cls, db):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            # Plain tuples are much cheaper than Row objects for a bulk read.
+            cursor.row_factory = None
+            rows = cursor.execute(_LINES_SQL).fetchall()
+            categories = dict(cursor.execute(_CATEGORIES_SQL).fetchall())
+
+        keys = {}
+        item_names = []
+        item = []
+        if rows:
+            order_id, ts, menu_item_ids, names, quantity, cents = zip(*rows)
+            for menu_item_id, name in zip(menu_item_ids, names):
+                key = name if menu_item_id is None else menu_item_id
+                index = keys.get(key)
+                if index is None:
+                    index = keys[key] = len(keys)
+                    item_names.append(name)
+                item.append(index)
+        else:
+            order_id = ts = quantity = cents = ()
+        columns = {
+            'order_id': np.array(order_id, dtype=np.int64),
+            'ts': np.array(ts, dtype=np.int64),
+            'item': np.array(item, dtype=np.int64),
+            'quantity': np.array(quantity, dtype=np.int64),
+            'cents': np.array(cents, dtype=np.int64),
+        }
+        columns['dow'], columns['hour'] = _local_day_and_hour(columns['ts'])
+        # Names are str keys and never match a menu item id.
+        return cls(columns, item_names, [categories.get(key, '') for key in keys])
+
+    @classmethod
+    def _load_cache(cls, folder, seq):
+        path = os.path.join(folder, f"seq-{seq}")
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in COLUMNS}
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(columns, meta['item_names'], meta['categories'])
+
+    def _save_cache(self, folder, seq):
+        name = f"seq-{seq}"
+        try:
+            os.makedirs(folder, exist_ok=True)
+            # Fill a private directory, then rename it into place in one step.
+            partial = tempfile.mkdtemp(prefix='.partial-', dir=folder)
+            for column in COLUMNS:
+                np.save(os.path.join(partial, f"{column}.npy"), self.columns[column])
+            with open(os.path.join(partial, 'meta.json'), 'w') as f:
+                json.dump({'seq': seq, 'item_names': self.item_names, 'categories': self.categories}, f)
+            try:
+                os.replace(partial, os.path.join(folder, name))
+            except OSError:
+                # Another worker cached this seq first.
+                shutil.rmtree(partial, ignore_errors=True)
+                return
+        except OSError as e:
+            Logger.error(f"Analytics: could not write cache: {e}")
+            return
+        # Older caches can go; a reader that still has them mapped keeps its view.
+        for entry in os.listdir(folder):
+            if entry.startswith('seq-') and entry != name:
+                shutil.rmtree(os.path.join(folder, entry), ignore_errors=True)
+
+    def since(self, timestamp):
+        """The lines of orders placed at or after ``timestamp`` (Unix seconds)."""
+        mask = self.ts >= timestamp
+        return SalesData({name: np.asarray(self.columns[name])[mask] for name in COLUMNS},
+                         self.item_names, self.categories)
+
+    def _order_starts(self):
+        """Index of each order's first line (lines are sorted by order id)."""
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(([0], np.flatnonzero(np.diff(self.order_id)) + 1))
+
+    def top_sellers(self, limit=10):
+        """Items by quantity sold: ``{name, category, quantity, revenue}``."""
+        n_items = len(self.item_names)
+        quantity = np.bincount(self.item, weights=self.quantity, minlength=n_items)
+        revenue = np.bincount(self.item, weights=self.cents, minlength=n_items)
+        ranked = np.argsort(-quantity, kind='stable')[:limit]
+        return [{
+            'name': self.item_names[i],
+            'category': self.categories[i],
+            'quantity': int(quantity[i]),
+            'revenue': revenue[i] / 100,
+        } for i in ranked if quantity[i] > 0]
+
+    def ticket_summary(self):
+        """Order count, revenue and average/median ticket size."""
+        starts = self._order_starts()
+        if not len(starts):
+            return {'orders': 0, 'revenue': 0.0, 'average': 0.0, 'median': 0.0, 'items_per_order': 0.0}
+        totals = np.add.reduceat(self.cents, starts)
+        items = np.add.reduceat(self.quantity, starts)
+        return {
+            'orders': len(starts),
+            'revenue': int(totals.sum()) / 100,
+            'average': float(totals.mean()) / 100,
+            'median': float(np.median(totals)) / 100,
+            'items_per_order': float(items.mean()),
+        }
+
+    def hour_heatmap(self):
+        """7 x 24 array of order counts by local day of week (0 = Sunday) and hour."""
+        starts = self._order_starts()
+        cells = self.dow[starts] * 24 + self.hour[starts]
+        return np.bincount(cells, minlength=7 * 24).reshape(7, 24)
+
+    def co_occurrence(self, limit=10):
+        """Item pairs most often in the same order.
+
+        Each entry is ``{a, b, orders, confidence}``, where confidence is the
+        share of ``a``'s orders that also had ``b``. Counts come from
+        ``M.T @ M`` over an order x item matrix, built a block of orders at a
+        time so memory stays bounded.
+        """
+        n_items = len(self.item_names)
+        if n_items < 2 or not len(self):
+            return []
+        order_index = np.zeros(len(self), dtype=np.int64)
+        order_index[self._order_starts()[1:]] = 1
+        order_index = np.cumsum(order_index)
+        # One entry per (order, item), however many lines or units it had.
+        pairs = np.unique(order_index * n_items + self.item)
+        orders, items = pairs // n_items, pairs % n_items
+
+        counts = np.zeros((n_items, n_items), dtype=np.float64)
+        block = max(1, CO_OCCURRENCE_BLOCK // n_items)
+        bounds = np.searchsorted(orders, np.arange(0, orders[-1] + block + 1, block))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if lo == hi:
+                continue
+            first = orders[lo]
+            matrix = np.zeros((orders[hi - 1] - first + 1, n_items), dtype=np.float32)
+            matrix[orders[lo:hi] - first, items[lo:hi]] = 1
+            counts += matrix.T @ matrix
+
+        item_orders = np.diag(counts).copy()
+        a, b = np.triu_indices(n_items, 1)
+        together = counts[a, b]
+        top = np.argsort(-together, kind='stable')[:limit]
+        results = []
+        for i in top:
+            if together[i] <= 0:
+                break
+            # Report each pair from the side it says more about.
+            first, second = (a[i], b[i]) if item_orders[a[i]] <= item_orders[b[i]] else (b[i], a[i])
+            results.append({
+                'a': self.item_names[first],
+                'b': self.item_names[second],
+                'orders': int(together[i]),
+                'confidence': float(together[i] / item_orders[first]),
+            })
+        return results
+
+
+def sales_report(db, days=None, top=10, cache_folder=CACHE_FOLDER):
+    """Every report for the last ``days`` days (all history if None), plus timings in ms."""
+    started = time.perf_counter()
+    data = SalesData.load(db, cache_folder)
+    loaded = time.perf_counter()
+    if days is not None:
+        data = data.since(int(time.time()) - days * 86400)
+    report = {
+        'summary': data.ticket_summary(),
+        'top_sellers': data.top_sellers(top),
+        'heatmap': data.hour_heatmap(),
+        'co_occurrence': data.co_occurrence(top),
+    }
+    finished = time.perf_counter()
+    report['load_ms'] = (loaded - started) * 1000
+    report['compute_ms'] = (finished - loaded) * 1000
+    return report
@@ -0,0 +1,92 @@
+import hashlib
+import hmac
+import bcrypt
+from kivy.logger import Logger
+from utils import hash_password
+
+# bcrypt cost used when settings.json doesn't set "bcrypt_rounds". Each step
+# doubles the work; slow tablets may want 10 or 11.
+DEFAULT_BCRYPT_ROUNDS = 12
+MIN_BCRYPT_ROUNDS = 4
+MAX_BCRYPT_ROUNDS = 16
+# How error messages name each role.
+ROLE_TITLES = {'user': 'a user', 'admin': 'an admin', 'super_admin': 'a super admin'}
+
+
+class AuthService:
+    """Checks and stores passwords for every login screen.
+
+    ``authenticate`` (``verify`` plus a role check) is what the login
+    screens call; both do the bcrypt work and are meant to run on a database
+    worker, never the UI thread. After a successful check, a password stored in an old
+    format -- a SHA-256 hex digest, a bcrypt hash saved as bytes, or bcrypt
+    at a different cost than ``rounds`` -- is re-hashed and saved.
+    """
+
+    def __init__(self, db, rounds=DEFAULT_BCRYPT_ROUNDS):
+        self.db = db
+        self.rounds = rounds
+
+    def configure(self, settings):
+        rounds = settings.get('bcrypt_rounds', DEFAULT_BCRYPT_ROUNDS)
+        try:
+            self.rounds = min(max(int(rounds), MIN_BCRYPT_ROUNDS), MAX_BCRYPT_ROUNDS)
+        except (TypeError, ValueError):
+            Logger.error(f"Auth: invalid bcrypt_rounds {rounds!r}, using {DEFAULT_BCRYPT_ROUNDS}")
+            self.rounds = DEFAULT_BCRYPT_ROUNDS
+
+    def hash_password(self, password):
+        return hash_password(password, self.rounds)
+
+    def create_user(self, username, password, role):
+        """Create an account; returns False if the username is taken."""
+        if self.db.get_user_by_username(username):
+            return False
+        self.db.create_user(username, self.hash_password(password), role)
+        return True
+
+    def verify(self, username, password):
+        """Return ``(user, error)``; ``user`` is ``{id, username, role}`` on success."""
+        user = self.db.get_user(username)
+        if not user:
+            return None, "User not found."
+        stored = user['password']
+        if not self._check(password, stored):
+            return None, "Incorrect password."
+        if self._needs_rehash(stored):
+            self.db.set_user_password(user['id'], self.hash_password(password))
+            Logger.info(f"Auth: upgraded stored password for {user['username']}")
+        return {'id': user['id'], 'username': user['username'], 'role': user['role']}, None
+
+    def authenticate(self, username, password, role):
+        """Like ``verify``, but only succeeds for an account with ``role``."""
+        user, error = self.verify(username, password)
+        if user is not None and user['role'] != role:
+            return None, f"Access denied: Not {ROLE_TITLES.get(role, role)}."
+        return user, error
+
+    @staticmethod
+    def _is_sha256(stored):
+        return isinstance(stored, str) and len(stored) == 64 and \
+            all(c in '0123456789abcdef' for c in stored)
+
+    def _check(self, password, stored):
+        if self._is_sha256(stored):
+            digest = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(digest, stored)
+        if isinstance(stored, str):
+            stored = stored.encode()
+        try:
+            return bcrypt.checkpw(password.encode(), stored)
+        except ValueError:
+            Logger.error("Auth: stored password hash is not a valid bcrypt hash")
+            return False
+
+    def _needs_rehash(self, stored):
+        if not isinstance(stored, str) or self._is_sha256(stored):
+            return True
+        # bcrypt hashes look like $2b$<cost>$...
+        try:
+            return int(stored.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
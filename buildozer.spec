@@ -30,7 +30,7 @@ android.ndk_api = 21
 python_version = 3.10
 
 # Dependencies
-requirements = kivy==2.3.1,bcrypt,cython==0.29.28,pyjnius==1.4.1, jinja2,setuptools,toml
+requirements = kivy==2.3.1,bcrypt,cython==0.29.28,pyjnius==1.4.1, jinja2,setuptools,toml,numpy
 
 
 # Enable sqlite3 support
@@ -0,0 +1,93 @@
+from kivy.event import EventDispatcher
+from kivy.properties import NumericProperty
+from utils import to_cents
+
+
+class CartLine:
+    __slots__ = ('item', 'quantity', 'unit_cents')
+
+    def __init__(self, item, quantity, unit_cents):
+        self.item = item
+        self.quantity = quantity
+        self.unit_cents = unit_cents
+
+    @property
+    def total_cents(self):
+        return self.unit_cents * self.quantity
+
+
+class Cart(EventDispatcher):
+    """The order being built on the till.
+
+    Lines are kept in a dict keyed by menu item id (so insertion order is
+    the order they were rung up) and every operation is O(1). ``total_cents``
+    is kept as a running integer total. Each change dispatches
+    ``on_change(action, menu_item_id, line)`` with action ``'added'``,
+    ``'updated'``, ``'removed'`` or ``'cleared'`` so views can patch a
+    single row.
+    """
+    total_cents = NumericProperty(0)
+
+    __events__ = ('on_change',)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lines = {}
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines.values())
+
+    def get(self, menu_item_id):
+        return self._lines.get(menu_item_id)
+
+    @property
+    def total(self):
+        return self.total_cents / 100
+
+    def add(self, item, quantity=1):
+        line = self._lines.get(item['id'])
+        if line is None:
+            line = self._lines[item['id']] = CartLine(item, 0, to_cents(item['price']))
+            action = 'added'
+        else:
+            action = 'updated'
+        line.quantity += quantity
+        self.total_cents += line.unit_cents * quantity
+        self.dispatch('on_change', action, item['id'], line)
+        return line
+
+    def decrement(self, menu_item_id, quantity=1):
+        line = self._lines.get(menu_item_id)
+        if line is None:
+            return
+        if line.quantity <= quantity:
+            self.remove(menu_item_id)
+            return
+        line.quantity -= quantity
+        self.total_cents -= line.unit_cents * quantity
+        self.dispatch('on_change', 'updated', menu_item_id, line)
+
+    def remove(self, menu_item_id):
+        line = self._lines.pop(menu_item_id, None)
+        if line is None:
+            return
+        self.total_cents -= line.total_cents
+        self.dispatch('on_change', 'removed', menu_item_id, line)
+
+    def clear(self):
+        self._lines = {}
+        self.total_cents = 0
+        self.dispatch('on_change', 'cleared', None, None)
+
+    def order_lines(self):
+        """``(menu_item_id, quantity)`` pairs, as Database.submit_order takes them."""
+        return [(menu_item_id, line.quantity) for menu_item_id, line in self._lines.items()]
+
+    def on_change(self, action, menu_item_id, line):
+        pass
@@ -1,148 +1,305 @@
 import sqlite3
 import os
+import random
+import threading
+import time
+from contextlib import contextmanager
 from kivy.logger import Logger
-import bcrypt
-from datetime import datetime
+from migrations import migrate
+from menu_catalog import MenuCatalog
+from events import EventBus
+from db_executor import DBExecutor
+from auth import AuthService
+import events
+from utils import to_utc_timestamp, to_cents, register_sql_functions
 
-class Database:
-    def __init__(self, db_name='data/restaurant.db'):
-        if not os.path.exists('data'):
-            os.makedirs('data')
+
+def order_line_error(line):
+    """Why ``line`` is not a usable ``(menu_item_id, quantity)`` pair, or None if it is."""
+    if not isinstance(line, (list, tuple)) or len(line) != 2:
+        return f"{line!r} is not a (menu_item_id, quantity) pair"
+    menu_item_id, quantity = line
+    if isinstance(menu_item_id, bool) or not isinstance(menu_item_id, int):
+        return f"menu item id {menu_item_id!r} is not an integer"
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+        return f"quantity {quantity!r} for menu item {menu_item_id} is not a positive integer"
+    return None
+
+
+# Upserts that fold orders into the sales rollup tables. Business days and
+# hours are local time. submit_order runs them for one order inside its own
+# transaction; rebuild_sales_rollups runs them over all history.
+_SALES_ROLLUP_SQL = (
+    """
+    INSERT INTO daily_sales (day, order_count, item_count, revenue_cents)
+    SELECT date(o.created_at, 'localtime'), COUNT(DISTINCT o.id), SUM(oi.quantity),
+           SUM(oi.line_total)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    {where}
+    GROUP BY 1
+    ON CONFLICT(day) DO UPDATE SET
+        order_count = order_count + excluded.order_count,
+        item_count = item_count + excluded.item_count,
+        revenue_cents = revenue_cents + excluded.revenue_cents
+    """,
+    """
+    INSERT INTO hourly_sales (day, hour, order_count, item_count, revenue_cents)
+    SELECT date(o.created_at, 'localtime'), CAST(strftime('%H', o.created_at, 'localtime') AS INTEGER),
+           COUNT(DISTINCT o.id), SUM(oi.quantity),
+           SUM(oi.line_total)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    {where}
+    GROUP BY 1, 2
+    ON CONFLICT(day, hour) DO UPDATE SET
+        order_count = order_count + excluded.order_count,
+        item_count = item_count + excluded.item_count,
+        revenue_cents = revenue_cents + excluded.revenue_cents
+    """,
+    """
+    INSERT INTO item_sales_daily (day, menu_item_id, quantity, revenue_cents)
+    SELECT date(o.created_at, 'localtime'), oi.menu_item_id, SUM(oi.quantity), SUM(oi.line_total)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id AND oi.menu_item_id IS NOT NULL
+    {where}
+    GROUP BY 1, 2
+    ON CONFLICT(day, menu_item_id) DO UPDATE SET
+        quantity = quantity + excluded.quantity,
+        revenue_cents = revenue_cents + excluded.revenue_cents
+    """,
+)
+_ROLLUP_TABLES = ('daily_sales', 'hourly_sales', 'item_sales_daily')
+
+# Kitchen ticket life cycle. An order may only move to the next status, and
+# each move is stamped in the matching orders column.
+ORDER_STATUSES = ('open', 'preparing', 'ready', 'served', 'closed')
+ORDER_STATUS_FLOW = dict(zip(ORDER_STATUSES, ORDER_STATUSES[1:]))
+_STATUS_TIMESTAMP_COLUMNS = {status: f"{status}_at" for status in ORDER_STATUSES[1:]}
+DEFAULT_STATION = 'kitchen'
+
+# SQLITE_BUSY / SQLITE_LOCKED primary result codes.
+_BUSY_ERROR_CODES = (5, 6)
+
+
+def _is_busy_error(error):
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in _BUSY_ERROR_CODES
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class ConnectionManager:
+    """Hands out one SQLite connection per thread.
+
+    Connections run in WAL mode so readers on background threads (exports,
+    reports, backups) never block the till while it writes.
+    """
+
+    def __init__(self, db_name, busy_timeout=5.0, cached_statements=256):
         self.db_name = db_name
-        self.conn = self._connect()
-        self.cursor = self.conn.cursor()
-        self.create_tables()
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
 
-    def _connect(self):
+    def _open(self):
         try:
-            conn = sqlite3.connect(self.db_name)
+            conn = sqlite3.connect(
+                self.db_name,
+                timeout=self.busy_timeout,
+                cached_statements=self.cached_statements,
+                check_same_thread=False  # only close_all() touches it from another thread
+            )
             conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON")  # ✅ Now conn is defined
+            register_sql_functions(conn)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+            conn.execute("PRAGMA foreign_keys = ON")
             return conn
         except sqlite3.Error as e:
             Logger.error(f"Database connection error: {e}")
             raise
 
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.add(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Yield this thread's connection.
+
+        The outermost block commits on success and rolls back on error, so
+        methods that call each other share a single transaction.
+        """
+        conn = self.get()
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            if self._local.depth == 1 and conn.in_transaction:
+                conn.rollback()
+            raise
+        else:
+            if self._local.depth == 1 and conn.in_transaction:
+                conn.commit()
+        finally:
+            self._local.depth -= 1
+
+    def release(self):
+        """Close the calling thread's connection, e.g. before a worker exits."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            with self._lock:
+                self._connections.discard(conn)
+            self._local.conn = None
+            conn.close()
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class Database:
+    # A write that is still busy after SQLite's own busy_timeout is retried
+    # this many times, sleeping a random 0..(base * 2**attempt) seconds first
+    # so terminals that collided do not retry in lockstep.
+    WRITE_RETRIES = 5
+    WRITE_RETRY_BASE_DELAY = 0.05
+    # Waiting longer than this for the write lock counts as contention.
+    CONTENTION_THRESHOLD = 0.005
+
+    def __init__(self, db_name='data/restaurant.db'):
+        if not os.path.exists('data'):
+            os.makedirs('data')
+        self.db_name = db_name
+        self.pool = ConnectionManager(db_name)
+        self.catalog = MenuCatalog(self)
+        self.events = EventBus()
+        self.executor = DBExecutor(self)
+        self.auth = AuthService(self)
+        self._stats_lock = threading.Lock()
+        self.write_stats = {'transactions': 0, 'contended': 0, 'lock_wait': 0.0, 'retries': 0, 'failures': 0}
+        self.migrate()
+
+    def connection(self):
+        return self.pool.connection()
+
+    def write_transaction(self, work, retries=None):
+        """Run ``work(conn)`` holding the write lock and return its result.
+
+        The transaction starts with BEGIN IMMEDIATE, so every read inside
+        ``work`` sees the data it is about to change and no other terminal can
+        write in between. It commits when ``work`` returns (``work`` may also
+        roll back itself). If the database stays busy the whole callable is
+        retried with jittered backoff, so ``work`` must not have side effects
+        outside the connection. Called inside an open transaction, ``work``
+        simply joins it.
+        """
+        conn = self.pool.get()
+        if conn.in_transaction:
+            return work(conn)
+
+        retries = self.WRITE_RETRIES if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    started = time.perf_counter()
+                    conn.execute("BEGIN IMMEDIATE")
+                    self._record_lock_wait(time.perf_counter() - started)
+                    return work(conn)
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not _is_busy_error(e) or attempt == retries:
+                    with self._stats_lock:
+                        self.write_stats['failures'] += 1
+                    raise
+                with self._stats_lock:
+                    self.write_stats['retries'] += 1
+                delay = random.uniform(0, self.WRITE_RETRY_BASE_DELAY * 2 ** attempt)
+                Logger.warning(f"Database busy ({e}); retry {attempt + 1}/{retries} in {delay * 1000:.0f} ms")
+                time.sleep(delay)
+
+    @contextmanager
+    def read_transaction(self):
+        """Yield this thread's connection inside one read transaction.
+
+        Every query in the block, including cursors iterated inside it, sees
+        the same snapshot of the database; writers on other connections are
+        not blocked. Nested inside an open transaction it simply joins it.
+        """
+        with self.connection() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            yield conn
+
+    def _record_lock_wait(self, waited):
+        with self._stats_lock:
+            stats = self.write_stats
+            stats['transactions'] += 1
+            stats['lock_wait'] += waited
+            if waited > self.CONTENTION_THRESHOLD:
+                stats['contended'] += 1
+
+    def get_write_stats(self):
+        """Snapshot of write-lock counters since start-up (lock_wait is in seconds)."""
+        with self._stats_lock:
+            return dict(self.write_stats)
+
     def initialize(self):
         print("Initializing database...")
-        self.create_tables()
-        
-    def create_user(self, username, password_hash, role):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-            (username, password_hash, role)
-        )
-        self.conn.commit()
-
-    def create_tables(self):
-        try:
-            self.cursor.executescript('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    role TEXT NOT NULL DEFAULT 'user' CHECK(role IN ('user', 'admin', 'super_admin'))
-                );
-
-                CREATE TABLE IF NOT EXISTS inventory (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE,
-                    quantity INTEGER,
-                    menu_item_id INTEGER UNIQUE,
-                    FOREIGN KEY (menu_item_id) REFERENCES menu_items(id)
-                );
-
-                CREATE TABLE IF NOT EXISTS categories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL
-                );
-                CREATE TABLE IF NOT EXISTS menu_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    price REAL NOT NULL,
-                    category_id INTEGER,
-                    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
-
-                );
-
-                CREATE TABLE IF NOT EXISTS orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    status TEXT DEFAULT 'open',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                );
-                CREATE TABLE IF NOT EXISTS order_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_id INTEGER,
-                    menu_item_id INTEGER,
-                    quantity INTEGER DEFAULT 1,
-                    FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
-                    FOREIGN KEY (menu_item_id) REFERENCES menu_items(id) ON DELETE CASCADE
-                );
-
-            ''')
-            self._create_default_admin_user()
-            self._create_indexes()
-            self.conn.commit()
-        except sqlite3.Error as e:
-            Logger.error(f"Error creating tables: {e}")
-            raise
+        self.migrate()
 
-    def _create_default_admin_user(self):
-        try:
-            hashed_password = bcrypt.hashpw('password'.encode('utf-8'), bcrypt.gensalt())
-            self.cursor.execute("INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)",
-                                ('admin', hashed_password, 'admin'))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            Logger.error(f"Error inserting admin user: {e}")
+    def create_user(self, username, password_hash, role):
+        with self.connection() as conn:
+            user_id = conn.execute(
+                "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                (username, password_hash, role)
+            ).lastrowid
+        self.events.publish(events.USER_ADDED, id=user_id, username=username, role=role)
 
-    def _create_indexes(self):
+    def migrate(self):
         try:
-            self.cursor.executescript('''
-                CREATE INDEX IF NOT EXISTS idx_menu_items_category_id ON menu_items(category_id);
-                CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
-                CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
-            ''')
-            self.conn.commit()
+            with self.connection() as conn:
+                return migrate(conn)
         except sqlite3.Error as e:
-            Logger.error(f"Error creating indexes: {e}")
+            Logger.error(f"Error migrating database: {e}")
+            raise
 
     # --- User Management ---
 
-    def authenticate_user(self, username, password):
-        try:
-            self.cursor.execute("SELECT id, username, password, role FROM users WHERE username = ?", (username,))
-            user = self.cursor.fetchone()
-            if user and bcrypt.checkpw(password.encode('utf-8'), user['password']):
-                return {'id': user['id'], 'username': user['username'], 'role': user['role']}
-            return None
-        except sqlite3.Error as e:
-            Logger.error(f"Error authenticating user: {e}")
-            return None
-
     def username_exists(self, username):
         try:
-            self.cursor.execute("SELECT 1 FROM users WHERE username = ?", (username,))
-            return self.cursor.fetchone() is not None
+            with self.connection() as conn:
+                return conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None
         except sqlite3.Error as e:
             Logger.error(f"Error checking username existence: {e}")
             return False
 
     def get_user_by_username(self, username):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-        user = cursor.fetchone()
-        return user
+        with self.connection() as conn:
+            return conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
 
     def register_user(self, username, password, role="user"):
         try:
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-            self.cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                                (username, hashed_password, role))
-            self.conn.commit()
+            hashed_password = self.auth.hash_password(password)
+            with self.connection() as conn:
+                user_id = conn.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                                       (username, hashed_password, role)).lastrowid
+            self.events.publish(events.USER_ADDED, id=user_id, username=username, role=role)
             return True
         except sqlite3.IntegrityError:
             Logger.warning(f"Username {username} already exists.")
@@ -152,9 +309,9 @@ class Database:
             return False
 
     def get_user(self, username):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, username, password, role FROM users WHERE username = ?", (username,))
-        row = cursor.fetchone()
+        with self.connection() as conn:
+            row = conn.execute("SELECT id, username, password, role FROM users WHERE username = ?",
+                               (username,)).fetchone()
         if row:
             return {
                 'id': row[0],
@@ -164,31 +321,37 @@ class Database:
             }
         return None
 
+    def set_user_password(self, user_id, password_hash):
+        with self.connection() as conn:
+            conn.execute("UPDATE users SET password = ? WHERE id = ?", (password_hash, user_id))
+
     def get_all_users(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, username, role FROM users")
-        rows = cursor.fetchall()
+        with self.connection() as conn:
+            rows = conn.execute("SELECT id, username, role FROM users").fetchall()
         return [{'id': row[0], 'username': row[1], 'role': row[2]} for row in rows]
 
     def delete_user(self, user_id):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-        self.conn.commit()
+        with self.connection() as conn:
+            conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        self.events.publish(events.USER_DELETED, id=user_id)
 
     # --- Category and Menu Management ---
 
     def get_categories(self):
         try:
-            self.cursor.execute("SELECT id, name FROM categories ORDER BY name")
-            return [dict(row) for row in self.cursor.fetchall()]
+            with self.connection() as conn:
+                rows = conn.execute("SELECT id, name, station FROM categories ORDER BY name").fetchall()
+            return [dict(row) for row in rows]
         except sqlite3.Error as e:
             Logger.error(f"Error fetching categories: {e}")
             return []
 
     def add_category(self, name):
         try:
-            self.cursor.execute("INSERT INTO categories (name) VALUES (?)", (name,))
-            self.conn.commit()
+            with self.connection() as conn:
+                category_id = conn.execute("INSERT INTO categories (name) VALUES (?)", (name,)).lastrowid
+            self.catalog.invalidate()
+            self.events.publish(events.CATEGORY_ADDED, id=category_id, name=name)
             return True
         except sqlite3.Error as e:
             Logger.error(f"Error adding category {name}: {e}")
@@ -202,22 +365,25 @@ class Database:
             # Use the inventory name as the menu item name if no custom name
             name = custom_name or inventory_name
 
-            # Insert into menu_items
-            self.cursor.execute("""
-                INSERT INTO menu_items (name, price, category_id)
-                VALUES (?, ?, ?)
-            """, (name, price, category_id))
+            with self.connection() as conn:
+                # Insert into menu_items
+                cursor = conn.execute("""
+                    INSERT INTO menu_items (name, price, category_id)
+                    VALUES (?, ?, ?)
+                """, (name, price, category_id))
 
-            menu_item_id = self.cursor.lastrowid
+                menu_item_id = cursor.lastrowid
 
-            # If linking to inventory, update the inventory row
-            if inventory_name:
-                self.cursor.execute("""
-                    UPDATE inventory SET menu_item_id = ?
-                    WHERE name = ?
-                """, (menu_item_id, inventory_name))
+                # If linking to inventory, update the inventory row
+                if inventory_name:
+                    conn.execute("""
+                        UPDATE inventory SET menu_item_id = ?
+                        WHERE name = ?
+                    """, (menu_item_id, inventory_name))
 
-            self.conn.commit()
+            self.catalog.invalidate()
+            self.events.publish(events.MENU_ITEM_ADDED, id=menu_item_id, name=name, price=price,
+                                category_id=category_id)
             return True
         except Exception as e:
             Logger.error(f"Add menu item error: {e}")
@@ -225,21 +391,38 @@ class Database:
 
     def get_menu_items(self):
         try:
-            self.cursor.execute('''
-                SELECT menu_items.id, menu_items.name, menu_items.price, categories.name AS category
-                FROM menu_items
-                LEFT JOIN categories ON menu_items.category_id = categories.id
-                ORDER BY menu_items.name
-            ''')
-            return [dict(row) for row in self.cursor.fetchall()]
+            with self.connection() as conn:
+                rows = conn.execute('''
+                    SELECT menu_items.id, menu_items.name, menu_items.price, categories.name AS category
+                    FROM menu_items
+                    LEFT JOIN categories ON menu_items.category_id = categories.id
+                    ORDER BY menu_items.name
+                ''').fetchall()
+            return [dict(row) for row in rows]
         except sqlite3.Error as e:
             Logger.error(f"Error fetching menu items: {e}")
             return []
 
+    def load_menu_snapshot(self):
+        """Categories, their items, prices and resolved stock in one query, for MenuCatalog."""
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT c.id AS category_id, c.name AS category_name,
+                       m.id AS menu_item_id, m.name, m.price,
+                       i.id AS inventory_id, i.quantity
+                FROM categories c
+                LEFT JOIN menu_items m ON m.category_id = c.id
+                LEFT JOIN inventory i ON i.id = COALESCE(
+                    (SELECT id FROM inventory WHERE menu_item_id = m.id),
+                    (SELECT id FROM inventory WHERE name = m.name)
+                )
+                ORDER BY c.name, c.id, m.id
+            ''').fetchall()
+
     def get_menu_item_by_name(self, name):
         try:
-            self.cursor.execute("SELECT id, name, price FROM menu_items WHERE name = ?", (name,))
-            row = self.cursor.fetchone()
+            with self.connection() as conn:
+                row = conn.execute("SELECT id, name, price FROM menu_items WHERE name = ?", (name,)).fetchone()
             return dict(row) if row else None
         except sqlite3.Error as e:
             Logger.error(f"Error fetching menu item: {e}")
@@ -247,16 +430,17 @@ class Database:
 
     def get_menu_items_by_category(self, category_id):
         try:
-            self.cursor.execute("""
-                SELECT m.id AS menu_item_id,
-                       m.name AS menu_item_name,
-                       m.price,
-                       i.id AS inventory_id,
-                       i.name AS inventory_name
-                FROM menu_items m
-                LEFT JOIN inventory i ON i.menu_item_id = m.id
-                WHERE m.category_id = ?
-            """, (category_id,))
+            with self.connection() as conn:
+                rows = conn.execute("""
+                    SELECT m.id AS menu_item_id,
+                           m.name AS menu_item_name,
+                           m.price,
+                           i.id AS inventory_id,
+                           i.name AS inventory_name
+                    FROM menu_items m
+                    LEFT JOIN inventory i ON i.menu_item_id = m.id
+                    WHERE m.category_id = ?
+                """, (category_id,)).fetchall()
 
             return [
                 {
@@ -266,7 +450,7 @@ class Database:
                     'inventory_id': row[3],
                     'inventory_name': row[4]
                 }
-                for row in self.cursor.fetchall()
+                for row in rows
             ]
         except sqlite3.Error as e:
             Logger.error(f"Error fetching menu items for category {category_id}: {e}")
@@ -274,11 +458,13 @@ class Database:
 
     def delete_menu_item(self, item_id):
         try:
-            # Delete inventory tied to the menu item
-            self.cursor.execute("DELETE FROM inventory WHERE menu_item_id = ?", (item_id,))
-            # Then delete the menu item itself
-            self.cursor.execute("DELETE FROM menu_items WHERE id = ?", (item_id,))
-            self.conn.commit()
+            with self.connection() as conn:
+                # Delete inventory tied to the menu item
+                conn.execute("DELETE FROM inventory WHERE menu_item_id = ?", (item_id,))
+                # Then delete the menu item itself
+                conn.execute("DELETE FROM menu_items WHERE id = ?", (item_id,))
+            self.catalog.invalidate()
+            self.events.publish(events.MENU_ITEM_DELETED, id=item_id)
             return True
         except sqlite3.Error as e:
             Logger.error(f"Database: Failed to delete menu item: {e}")
@@ -286,12 +472,14 @@ class Database:
 
     def delete_category(self, category_id):
         try:
-            # First, delete menu items related to the category
-            self.conn.execute("DELETE FROM menu_items WHERE category_id = ?", (category_id,))
+            with self.connection() as conn:
+                # First, delete menu items related to the category
+                conn.execute("DELETE FROM menu_items WHERE category_id = ?", (category_id,))
 
-            # Now, delete the category itself
-            self.conn.execute("DELETE FROM categories WHERE id = ?", (category_id,))
-            self.conn.commit()
+                # Now, delete the category itself
+                conn.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+            self.catalog.invalidate()
+            self.events.publish(events.CATEGORY_DELETED, id=category_id)
             print(f"Category {category_id} and its items deleted successfully.")
             return True
         except sqlite3.Error as e:
@@ -300,10 +488,12 @@ class Database:
 
     def link_inventory_to_menu_item(self, inventory_id, menu_item_id):
         try:
-            self.cursor.execute('''
-                UPDATE inventory SET menu_item_id = ? WHERE id = ?
-            ''', (menu_item_id, inventory_id))
-            self.conn.commit()
+            with self.connection() as conn:
+                conn.execute('''
+                    UPDATE inventory SET menu_item_id = ? WHERE id = ?
+                ''', (menu_item_id, inventory_id))
+            self.catalog.invalidate()
+            self.events.publish(events.STOCK_CHANGED, menu_item_ids=[menu_item_id])
             return True
         except sqlite3.Error as e:
             Logger.error(f"Error linking inventory to menu item: {e}")
@@ -313,41 +503,47 @@ class Database:
 
     def add_or_update_inventory_item(self, name, quantity):
         try:
-            self.cursor.execute("SELECT id FROM menu_items WHERE name = ?", (name,))
-            menu_item = self.cursor.fetchone()
-            if not menu_item:
-                Logger.warning(f"No matching menu item found for inventory name: {name}")
-                return
+            with self.connection() as conn:
+                menu_item = conn.execute("SELECT id FROM menu_items WHERE name = ?", (name,)).fetchone()
+                if not menu_item:
+                    Logger.warning(f"No matching menu item found for inventory name: {name}")
+                    return
 
-            menu_item_id = menu_item['id']
-            self.cursor.execute('''
-                INSERT INTO inventory (name, quantity, menu_item_id)
-                VALUES (?, ?, ?)
-                ON CONFLICT(name) DO UPDATE SET quantity = quantity + excluded.quantity
-            ''', (name, quantity, menu_item_id))
-            self.conn.commit()
+                menu_item_id = menu_item['id']
+                conn.execute('''
+                    INSERT INTO inventory (name, quantity, menu_item_id)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET quantity = quantity + excluded.quantity
+                ''', (name, quantity, menu_item_id))
+                new_quantity = conn.execute("SELECT quantity FROM inventory WHERE name = ?", (name,)).fetchone()[0]
+            self.catalog.invalidate()
+            self.events.publish(events.INVENTORY_CHANGED, name=name, quantity=new_quantity)
         except sqlite3.Error as e:
             Logger.error(f"Error updating inventory: {e}")
 
     def get_inventory_items(self):
         try:
-            self.cursor.execute('SELECT name, quantity FROM inventory')
-            return [dict(row) for row in self.cursor.fetchall()]
+            with self.connection() as conn:
+                rows = conn.execute('SELECT name, quantity FROM inventory').fetchall()
+            return [dict(row) for row in rows]
         except sqlite3.Error as e:
             Logger.error(f"Error fetching inventory items: {e}")
             return []
 
     def reduce_inventory_by_id(self, item_id, quantity):
         try:
-            self.cursor.execute('''
-                UPDATE inventory
-                SET quantity = quantity - ?
-                WHERE id = ? AND quantity >= ?
-            ''', (quantity, item_id, quantity))
-            if self.cursor.rowcount == 0:
-                Logger.warning(f"Not enough inventory for item ID {item_id}")
-                return False
-            self.conn.commit()
+            with self.connection() as conn:
+                cursor = conn.execute('''
+                    UPDATE inventory
+                    SET quantity = quantity - ?
+                    WHERE id = ? AND quantity >= ?
+                ''', (quantity, item_id, quantity))
+                if cursor.rowcount == 0:
+                    Logger.warning(f"Not enough inventory for item ID {item_id}")
+                    return False
+                row = conn.execute("SELECT name, quantity FROM inventory WHERE id = ?", (item_id,)).fetchone()
+            self.catalog.invalidate()
+            self.events.publish(events.INVENTORY_CHANGED, name=row['name'], quantity=row['quantity'])
             return True
         except sqlite3.Error as e:
             Logger.error(f"Error reducing inventory by ID: {e}")
@@ -355,56 +551,51 @@ class Database:
 
     def get_available_menu_items(self):
         try:
-            self.cursor.execute('''
-                SELECT menu_items.name, menu_items.price, inventory.quantity
-                FROM menu_items
-                JOIN inventory ON menu_items.name = inventory.name
-            ''')
-            return [dict(row) for row in self.cursor.fetchall()]
+            with self.connection() as conn:
+                rows = conn.execute('''
+                    SELECT menu_items.name, menu_items.price, inventory.quantity
+                    FROM menu_items
+                    JOIN inventory ON menu_items.name = inventory.name
+                ''').fetchall()
+            return [dict(row) for row in rows]
         except sqlite3.Error as e:
             Logger.error(f"Error fetching available menu items: {e}")
             return []
 
     def get_inventory_by_menu_item_id(self, menu_item_id):
         try:
-            self.cursor.execute('''
-                SELECT inventory.id, inventory.name, inventory.quantity
-                FROM inventory
-                JOIN menu_items ON inventory.name = menu_items.name
-                WHERE menu_items.id = ?
-            ''', (menu_item_id,))
-            row = self.cursor.fetchone()
+            with self.connection() as conn:
+                row = conn.execute('''
+                    SELECT inventory.id, inventory.name, inventory.quantity
+                    FROM inventory
+                    JOIN menu_items ON inventory.name = menu_items.name
+                    WHERE menu_items.id = ?
+                ''', (menu_item_id,)).fetchone()
             return dict(row) if row else None
         except sqlite3.Error as e:
             Logger.error(f"Error fetching inventory by menu item ID: {e}")
             return None
 
     def reduce_inventory_by_menu_item_id(self, menu_item_id, quantity):
-        try:
-            # Try reducing by menu_item_id first
-            self.cursor.execute('''
+        def reduce(conn):
+            # One conditional UPDATE: the record linked by menu_item_id wins,
+            # falling back to the inventory row named after the menu item.
+            return conn.execute('''
                 UPDATE inventory
                 SET quantity = quantity - ?
-                WHERE menu_item_id = ? AND quantity >= ?
-            ''', (quantity, menu_item_id, quantity))
-
-            if self.cursor.rowcount == 0:
-                # Fallback: Try matching by name if menu_item_id is not set
-                self.cursor.execute('SELECT name FROM menu_items WHERE id = ?', (menu_item_id,))
-                row = self.cursor.fetchone()
-                if row:
-                    name = row['name']
-                    self.cursor.execute('''
-                        UPDATE inventory
-                        SET quantity = quantity - ?
-                        WHERE name = ? AND quantity >= ?
-                    ''', (quantity, name, quantity))
-
-            if self.cursor.rowcount == 0:
+                WHERE id = COALESCE(
+                    (SELECT id FROM inventory WHERE menu_item_id = ?),
+                    (SELECT i.id FROM inventory i JOIN menu_items m ON m.name = i.name WHERE m.id = ?)
+                ) AND quantity >= ?
+            ''', (quantity, menu_item_id, menu_item_id, quantity)).rowcount
+
+        try:
+            if not self.write_transaction(reduce):
                 Logger.warning(f"Not enough inventory for menu_item_id {menu_item_id}")
                 return False
 
-            self.conn.commit()
+            self.catalog.apply_stock_deltas({menu_item_id: -quantity})
+            self.events.publish(events.STOCK_CHANGED, menu_item_ids=[menu_item_id])
             return True
         except sqlite3.Error as e:
             Logger.error(f"Error reducing inventory: {e}")
@@ -412,85 +603,305 @@ class Database:
 
     def delete_inventory_item(self, name):
         try:
-            self.cursor.execute("DELETE FROM inventory WHERE name = ?", (name,))
-            self.conn.commit()
+            with self.connection() as conn:
+                conn.execute("DELETE FROM inventory WHERE name = ?", (name,))
+            self.catalog.invalidate()
+            self.events.publish(events.INVENTORY_CHANGED, name=name, quantity=None)
         except sqlite3.Error as e:
             Logger.error(f"Error deleting inventory item: {e}")
 
     def set_inventory_quantity(self, name, new_quantity):
         try:
-            self.cursor.execute('UPDATE inventory SET quantity = ? WHERE name = ?', (new_quantity, name))
-            self.conn.commit()
+            with self.connection() as conn:
+                conn.execute('UPDATE inventory SET quantity = ? WHERE name = ?', (new_quantity, name))
+            self.catalog.invalidate()
+            self.events.publish(events.INVENTORY_CHANGED, name=name, quantity=new_quantity)
         except sqlite3.Error as e:
             Logger.error(f"Error setting inventory quantity: {e}")
 
     # --- Orders Management ---
 
-    def create_order(self, user_id):
+    def _aggregate_lines(self, lines):
+        """Total the quantity per menu item; raises ValueError for a bad line or unknown item."""
+        try:
+            lines = list(lines)
+        except TypeError:
+            raise ValueError(f"order lines {lines!r} are not a list of (menu_item_id, quantity) pairs")
+        requested = {}
+        for line in lines:
+            error = order_line_error(line)
+            if error:
+                raise ValueError(error)
+            menu_item_id, quantity = line
+            requested[menu_item_id] = requested.get(menu_item_id, 0) + quantity
+        if requested:
+            placeholders = ", ".join("?" * len(requested))
+            with self.connection() as conn:
+                known = {row[0] for row in conn.execute(
+                    f"SELECT id FROM menu_items WHERE id IN ({placeholders})", tuple(requested))}
+            unknown = sorted(set(requested) - known)
+            if unknown:
+                raise ValueError(f"unknown menu item ids {unknown}")
+        return requested
+
+    def _checked_lines(self, user_id, lines):
+        """_aggregate_lines, logging and returning None for an order that can't be accepted."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT INTO orders (user_id) VALUES (?)", (user_id,))
-            self.conn.commit()
-            order_id = cursor.lastrowid
-            print(f"[DEBUG] Created order_id: {order_id}")
-            return order_id
+            return self._aggregate_lines(lines)
+        except ValueError as e:
+            Logger.error(f"Rejected order for user {user_id}: {e}")
+            return None
         except sqlite3.Error as e:
-            print(f"[ERROR] Failed to create order: {e}")
+            Logger.error(f"Error checking order lines: {e}")
             return None
 
-    def add_item_to_order(self, order_id, menu_item_id, quantity=1):
+    def submit_order(self, user_id, lines):
+        """Check stock, write the order and decrement inventory in one transaction.
+
+        ``lines`` is an iterable of ``(menu_item_id, quantity)`` pairs. Returns
+        ``(order_id, shortages)``: on success ``shortages`` is empty; when any
+        line cannot be filled nothing is written, ``order_id`` is None and each
+        shortage is a dict with ``menu_item_id``, ``name``, ``requested`` and
+        ``available`` (None when the item has no inventory record).
+        ``requested`` is everything the order takes from that item's
+        inventory record, which other menu items in the order may share. Orders with
+        a malformed line, a quantity below 1 or an unknown menu item are
+        rejected before anything is written: the result is ``(None, [])``.
+        """
+        requested = self._checked_lines(user_id, lines)
+        if not requested:
+            return None, []
+
         try:
-            self.cursor.execute('''
-                INSERT INTO order_items (order_id, menu_item_id, quantity)
-                VALUES (?, ?, ?)
-            ''', (order_id, menu_item_id, quantity))
-            self.conn.commit()
-            return True
+            order_id, shortages = self.write_transaction(lambda conn: self._write_order(conn, user_id, requested))
+            if shortages:
+                return None, shortages
+            self.catalog.apply_stock_deltas({menu_item_id: -quantity for menu_item_id, quantity in requested.items()})
+            self._publish_orders([(order_id, user_id, requested)])
+            return order_id, []
         except sqlite3.Error as e:
-            Logger.error(f"Error adding item to order: {e}")
-            return False
+            Logger.error(f"Error submitting order: {e}")
+            return None, []
+
+    def submit_orders_batch(self, orders):
+        """Submit several ``(user_id, lines)`` orders in one group commit.
 
-    def add_order_item(self, order_id, item_name, quantity):
+        Each order runs inside its own savepoint, so one order falling short
+        leaves the others untouched, but the batch pays for a single commit.
+        Returns a list of ``(order_id, shortages)`` in the same order, as
+        submit_order would.
+        """
+        def submit_all(conn):
+            results = []
+            for user_id, requested in batch:
+                if not requested:
+                    results.append((None, []))
+                    continue
+                conn.execute("SAVEPOINT submit_order")
+                try:
+                    results.append(self._write_order(conn, user_id, requested))
+                except sqlite3.IntegrityError as e:
+                    Logger.warning(f"Order for user {user_id} rejected: {e}")
+                    conn.execute("ROLLBACK TO submit_order")
+                    results.append((None, []))
+                conn.execute("RELEASE submit_order")
+            return results
+
+        batch = [(user_id, self._checked_lines(user_id, lines)) for user_id, lines in orders]
         try:
-            self.cursor.execute("SELECT id FROM menu_items WHERE name = ?", (item_name,))
-            row = self.cursor.fetchone()
-            if row:
-                return self.add_item_to_order(order_id, row['id'], quantity)
-            return False
+            results = self.write_transaction(submit_all)
         except sqlite3.Error as e:
-            Logger.error(f"Error adding order item: {e}")
-            return False
+            Logger.error(f"Error submitting order batch: {e}")
+            return [(None, []) for _ in batch]
+
+        deltas = {}
+        for (_, requested), (order_id, _) in zip(batch, results):
+            if order_id:
+                for menu_item_id, quantity in requested.items():
+                    deltas[menu_item_id] = deltas.get(menu_item_id, 0) - quantity
+        self.catalog.apply_stock_deltas(deltas)
+        self._publish_orders([(order_id, user_id, requested)
+                              for (user_id, requested), (order_id, _) in zip(batch, results) if order_id])
+        return results
+
+    def _publish_orders(self, orders):
+        """Publish ORDER_CREATED per ``(order_id, user_id, requested)`` and one STOCK_CHANGED."""
+        menu_item_ids = set()
+        for order_id, user_id, requested in orders:
+            self.events.publish(events.ORDER_CREATED, id=order_id, user_id=user_id)
+            menu_item_ids.update(requested)
+        if menu_item_ids:
+            self.events.publish(events.STOCK_CHANGED, menu_item_ids=sorted(menu_item_ids))
+
+    def _write_order(self, conn, user_id, requested):
+        """Write one order inside the caller's write transaction; see submit_order."""
+        placeholders = ", ".join("?" * len(requested))
+        rows = conn.execute(f'''
+            SELECT m.id AS menu_item_id, m.name, m.price, i.id AS inventory_id, i.quantity
+            FROM menu_items m
+            LEFT JOIN inventory i ON i.id = COALESCE(
+                (SELECT id FROM inventory WHERE menu_item_id = m.id),
+                (SELECT id FROM inventory WHERE name = m.name)
+            )
+            WHERE m.id IN ({placeholders})
+        ''', tuple(requested)).fetchall()
+        stock = {row['menu_item_id']: row for row in rows}
+
+        # Menu items can share an inventory record (through the name
+        # fallback), so stock is checked and taken per record.
+        drawn = {}
+        for menu_item_id, quantity in requested.items():
+            row = stock.get(menu_item_id)
+            if row and row['inventory_id'] is not None:
+                drawn[row['inventory_id']] = drawn.get(row['inventory_id'], 0) + quantity
+
+        shortages = []
+        for menu_item_id, quantity in requested.items():
+            row = stock.get(menu_item_id)
+            available = row['quantity'] if row and row['inventory_id'] is not None else None
+            total = drawn[row['inventory_id']] if available is not None else quantity
+            if available is None or available < total:
+                shortages.append({
+                    'menu_item_id': menu_item_id,
+                    'name': row['name'] if row else None,
+                    'requested': total,
+                    'available': available
+                })
+        if shortages:
+            return None, shortages
+
+        order_lines = []
+        for menu_item_id, quantity in requested.items():
+            unit_price = to_cents(stock[menu_item_id]['price'])
+            order_lines.append((menu_item_id, stock[menu_item_id]['name'], quantity,
+                                unit_price, unit_price * quantity))
+        order_id = conn.execute(
+            "INSERT INTO orders (user_id, total_cents) VALUES (?, ?)",
+            (user_id, sum(line[4] for line in order_lines))
+        ).lastrowid
+        conn.executemany('''
+            INSERT INTO order_items (order_id, menu_item_id, item_name, quantity, unit_price, line_total)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(order_id,) + line for line in order_lines])
+
+        decremented = conn.executemany('''
+            UPDATE inventory
+            SET quantity = quantity - ?
+            WHERE id = ? AND quantity >= ?
+        ''', [(quantity, inventory_id, quantity) for inventory_id, quantity in drawn.items()]).rowcount
+        if decremented != len(drawn):
+            raise sqlite3.IntegrityError("Inventory changed during order submission")
+
+        for statement in _SALES_ROLLUP_SQL:
+            conn.execute(statement.format(where="WHERE o.id = ?"), (order_id,))
+        return order_id, []
 
-    def get_active_orders(self):
+    # --- Kitchen Queue ---
+
+    def get_active_orders(self, station=None, order_ids=None):
+        """Open kitchen tickets, oldest first, optionally only ``order_ids``.
+
+        Each ticket is ``{id, username, status, created_at, time, items}`` with
+        items ``{name, quantity, station}``. With ``station`` only that
+        station's lines are kept and tickets without any are dropped. The
+        ``status != 'closed'`` filter is served by the idx_orders_active
+        partial index, so the cost follows the open tickets, not history.
+        """
+        id_filter = ""
+        params = []
+        if order_ids is not None:
+            if not order_ids:
+                return []
+            id_filter = f"AND o.id IN ({', '.join('?' * len(order_ids))})"
+            params.extend(order_ids)
         try:
-            self.cursor.execute('''
-                SELECT o.id, u.username, o.created_at, o.status
-                FROM orders o
-                JOIN users u ON o.user_id = u.id
-                WHERE o.status != 'closed'
-                ORDER BY o.created_at DESC
-            ''')
-            return [{
-                'id': row['id'],
-                'username': row['username'],
-                'time': datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S').strftime('%b %d, %I:%M %p'),
-                'status': row['status']
-            } for row in self.cursor.fetchall()]
+            with self.connection() as conn:
+                rows = conn.execute(f'''
+                    SELECT o.id, COALESCE(u.username, 'Unknown') AS username, o.status, o.created_at,
+                           strftime('%H:%M', o.created_at, 'localtime') AS time,
+                           oi.item_name, oi.quantity, COALESCE(c.station, '{DEFAULT_STATION}') AS station
+                    FROM orders o
+                    LEFT JOIN users u ON u.id = o.user_id
+                    LEFT JOIN order_items oi ON oi.order_id = o.id
+                    LEFT JOIN menu_items m ON m.id = oi.menu_item_id
+                    LEFT JOIN categories c ON c.id = m.category_id
+                    WHERE o.status != 'closed' {id_filter}
+                    ORDER BY o.created_at, o.id, oi.id
+                ''', params).fetchall()
         except sqlite3.Error as e:
             Logger.error(f"Error fetching active orders: {e}")
             return []
 
+        tickets = {}
+        for row in rows:
+            ticket = tickets.get(row['id'])
+            if ticket is None:
+                ticket = tickets[row['id']] = {
+                    'id': row['id'],
+                    'username': row['username'],
+                    'status': row['status'],
+                    'created_at': row['created_at'],
+                    'time': row['time'],
+                    'items': []
+                }
+            if row['item_name'] is not None and station in (None, row['station']):
+                ticket['items'].append({'name': row['item_name'], 'quantity': row['quantity'],
+                                        'station': row['station']})
+        return [ticket for ticket in tickets.values() if station is None or ticket['items']]
+
+    def advance_order_status(self, order_id, status=None):
+        """Move an order to ``status`` (default: its next status) and stamp the time.
+
+        Only the next step of ORDER_STATUS_FLOW is allowed. Returns the new
+        status, or None when the order is missing or not in the right state.
+        """
+        def advance(conn):
+            row = conn.execute("SELECT status FROM orders WHERE id = ?", (order_id,)).fetchone()
+            target = ORDER_STATUS_FLOW.get(row['status']) if row else None
+            if target is None or status not in (None, target):
+                return None
+            conn.execute(
+                f"UPDATE orders SET status = ?, {_STATUS_TIMESTAMP_COLUMNS[target]} = CURRENT_TIMESTAMP WHERE id = ?",
+                (target, order_id))
+            return target
+
+        try:
+            new_status = self.write_transaction(advance)
+        except sqlite3.Error as e:
+            Logger.error(f"Error updating status of order {order_id}: {e}")
+            return None
+        if new_status:
+            self.events.publish(events.ORDER_STATUS_CHANGED, id=order_id, status=new_status)
+        return new_status
+
+    def get_stations(self):
+        with self.connection() as conn:
+            rows = conn.execute("SELECT DISTINCT station FROM categories ORDER BY station").fetchall()
+        return [row['station'] for row in rows]
+
+    def set_category_station(self, category_id, station):
+        """Route a category's items to a preparation station (e.g. 'kitchen', 'bar')."""
+        try:
+            with self.connection() as conn:
+                conn.execute("UPDATE categories SET station = ? WHERE id = ?",
+                             (station or DEFAULT_STATION, category_id))
+            return True
+        except sqlite3.Error as e:
+            Logger.error(f"Error setting station for category {category_id}: {e}")
+            return False
+
     # --- Order History ---
 
     def get_all_orders(self):
         try:
-            self.cursor.execute("""
-                SELECT o.id, o.created_at, u.username AS user_name
-                FROM orders o
-                JOIN users u ON o.user_id = u.id
-                ORDER BY o.created_at DESC
-            """)
-            orders = [dict(row) for row in self.cursor.fetchall()]
+            with self.connection() as conn:
+                rows = conn.execute("""
+                    SELECT o.id, o.created_at, u.username AS user_name
+                    FROM orders o
+                    JOIN users u ON o.user_id = u.id
+                    ORDER BY o.created_at DESC
+                """).fetchall()
+            orders = [dict(row) for row in rows]
             Logger.info(f"Fetched orders: {orders}")  # Log the fetched orders for debugging
             return orders
         except sqlite3.Error as e:
@@ -499,25 +910,275 @@ class Database:
 
     def get_items_by_order_id(self, order_id):
         try:
-            self.cursor.execute("""
-                SELECT m.name, oi.quantity, m.price
-                FROM order_items oi
-                JOIN menu_items m ON oi.menu_item_id = m.id
-                WHERE oi.order_id = ?
-            """, (order_id,))
-            return [dict(row) for row in self.cursor.fetchall()]
+            with self.connection() as conn:
+                rows = conn.execute("""
+                    SELECT item_name AS name, quantity, unit_price / 100.0 AS price
+                    FROM order_items
+                    WHERE order_id = ?
+                """, (order_id,)).fetchall()
+            return [dict(row) for row in rows]
         except sqlite3.Error as e:
             Logger.error(f"Error fetching items for order {order_id}: {e}")
             return []
 
+    @staticmethod
+    def _range_clause(start, end, after=None):
+        """WHERE clause and params bounding ``orders.created_at`` to [start, end).
+
+        ``after`` is a ``(created_at, id)`` keyset cursor; only orders older
+        than it in history order are matched.
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("o.created_at >= ?")
+            params.append(to_utc_timestamp(start))
+        if end is not None:
+            clauses.append("o.created_at < ?")
+            params.append(to_utc_timestamp(end))
+        if after is not None:
+            created_at, order_id = after
+            # A row value lets SQLite seek idx_orders_created_at to the cursor;
+            # the equivalent OR form makes it scan the index from the newest row.
+            clauses.append("(o.created_at, o.id) < (?, ?)")
+            params.extend([created_at, order_id])
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _query_order_history(self, start=None, end=None, after=None, limit=None):
+        where, params = self._range_clause(start, end, after)
+        if limit is not None:
+            params.append(limit)
+        return self.pool.get().execute(f"""
+            WITH page AS (
+                SELECT o.id, o.created_at, o.user_id, o.total_cents
+                FROM orders o
+                {where}
+                ORDER BY o.created_at DESC, o.id DESC
+                {"LIMIT ?" if limit is not None else ""}
+            )
+            SELECT page.id, page.created_at, COALESCE(u.username, 'Unknown') AS user_name,
+                   page.total_cents / 100.0 AS total,
+                   oi.item_name, oi.quantity, oi.unit_price / 100.0 AS price
+            FROM page
+            LEFT JOIN users u ON u.id = page.user_id
+            LEFT JOIN order_items oi ON oi.order_id = page.id
+            ORDER BY page.created_at DESC, page.id DESC, oi.id
+        """, params)
+
+    @staticmethod
+    def _group_order_rows(rows):
+        order = None
+        for row in rows:
+            if order is None or order['id'] != row['id']:
+                if order is not None:
+                    yield order
+                order = {
+                    'id': row['id'],
+                    'created_at': row['created_at'],
+                    'user_name': row['user_name'],
+                    'total': row['total'],
+                    'items': []
+                }
+            if row['item_name'] is not None:
+                order['items'].append({'name': row['item_name'], 'quantity': row['quantity'], 'price': row['price']})
+        if order is not None:
+            yield order
+
+    def iter_order_history(self, start=None, end=None):
+        """Yield orders newest first, each with its lines and SQL-computed total.
+
+        ``start``/``end`` bound ``created_at`` to a half-open range and may be
+        local datetimes or UTC timestamp strings. One joined query is walked in
+        a single pass, grouping consecutive rows by order id, so memory stays
+        at one order regardless of history size.
+        """
+        return self._group_order_rows(self._query_order_history(start, end))
+
+    def get_order_history(self, start=None, end=None):
+        try:
+            return list(self.iter_order_history(start, end))
+        except sqlite3.Error as e:
+            Logger.error(f"Error fetching order history: {e}")
+            return []
+
+    def get_order_history_page(self, after=None, limit=50, start=None, end=None):
+        """One page of order history, newest first.
+
+        Returns ``(orders, next_cursor)``; pass ``next_cursor`` back as
+        ``after`` to fetch the following page. It is None on the last page.
+        The ``(created_at, id)`` keyset walks idx_orders_created_at directly,
+        so every page costs the same no matter how deep into history it is.
+        """
+        try:
+            orders = list(self._group_order_rows(self._query_order_history(start, end, after, limit)))
+        except sqlite3.Error as e:
+            Logger.error(f"Error fetching order history page: {e}")
+            return [], None
+        if len(orders) < limit:
+            return orders, None
+        return orders, (orders[-1]['created_at'], orders[-1]['id'])
+
+    def get_order(self, order_id):
+        """One order in the same shape as the history entries, or None."""
+        try:
+            with self.connection() as conn:
+                rows = conn.execute("""
+                    SELECT o.id, o.created_at, COALESCE(u.username, 'Unknown') AS user_name,
+                           o.total_cents / 100.0 AS total,
+                           oi.item_name, oi.quantity, oi.unit_price / 100.0 AS price
+                    FROM orders o
+                    LEFT JOIN users u ON u.id = o.user_id
+                    LEFT JOIN order_items oi ON oi.order_id = o.id
+                    WHERE o.id = ?
+                    ORDER BY oi.id
+                """, (order_id,)).fetchall()
+        except sqlite3.Error as e:
+            Logger.error(f"Error fetching order #{order_id}: {e}")
+            return None
+        return next(self._group_order_rows(rows), None)
+
+    def count_export_rows(self, start=None, end=None):
+        where, params = self._range_clause(start, end)
+        with self.connection() as conn:
+            return conn.execute(f"""
+                SELECT COUNT(*)
+                FROM orders o
+                JOIN order_items oi ON oi.order_id = o.id
+                {where}
+            """, params).fetchone()[0]
+
+    def iter_export_rows(self, start=None, end=None, batch_size=500):
+        """Yield flat order-line rows for exports, oldest first, ``batch_size`` at a time.
+
+        Each row is ``(order_id, created_at, user_name, item_name, quantity, price)``.
+        """
+        where, params = self._range_clause(start, end)
+        cursor = self.pool.get().execute(f"""
+            SELECT o.id, o.created_at, COALESCE(u.username, 'Unknown'), oi.item_name, oi.quantity,
+                   oi.unit_price / 100.0
+            FROM orders o
+            JOIN order_items oi ON oi.order_id = o.id
+            LEFT JOIN users u ON u.id = o.user_id
+            {where}
+            ORDER BY o.created_at, o.id, oi.id
+        """, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
     def clear_all_orders(self):
-        cursor = self.conn.cursor()
+        with self.connection() as conn:
+            # Delete all records from order_items and orders tables
+            conn.execute("DELETE FROM order_items")
+            conn.execute("DELETE FROM orders")
+            for table in _ROLLUP_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+        self.events.publish(events.ORDERS_CLEARED)
+
+    # --- Sales Rollups ---
+
+    def rebuild_sales_rollups(self):
+        """Recompute every rollup table from order history, e.g. after an import or manual edit."""
+        def rebuild(conn):
+            for table in _ROLLUP_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            for statement in _SALES_ROLLUP_SQL:
+                conn.execute(statement.format(where="WHERE true"))
+            return conn.execute("SELECT COUNT(*) FROM daily_sales").fetchone()[0]
+
+        return self.write_transaction(rebuild)
+
+    def get_daily_sales(self, day):
+        """Totals for one local business day (a date or 'YYYY-MM-DD')."""
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT day, order_count, item_count, revenue_cents FROM daily_sales WHERE day = ?",
+                (str(day),)).fetchone()
+        return dict(row) if row else {'day': str(day), 'order_count': 0, 'item_count': 0, 'revenue_cents': 0}
+
+    def get_daily_sales_range(self, first_day, last_day):
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT day, order_count, item_count, revenue_cents FROM daily_sales "
+                "WHERE day BETWEEN ? AND ? ORDER BY day",
+                (str(first_day), str(last_day))).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_hourly_sales(self, day):
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT hour, order_count, item_count, revenue_cents FROM hourly_sales "
+                "WHERE day = ? ORDER BY hour",
+                (str(day),)).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_item_sales(self, day):
+        with self.connection() as conn:
+            rows = conn.execute("""
+                SELECT s.menu_item_id, COALESCE(m.name, 'Deleted item') AS name, s.quantity, s.revenue_cents
+                FROM item_sales_daily s
+                LEFT JOIN menu_items m ON m.id = s.menu_item_id
+                WHERE s.day = ?
+                ORDER BY s.revenue_cents DESC
+            """, (str(day),)).fetchall()
+        return [dict(row) for row in rows]
 
-        # Delete all records from order_items and orders tables
-        cursor.execute("DELETE FROM order_items")
-        cursor.execute("DELETE FROM orders")
+    # --- Change Log ---
 
-        self.conn.commit()
+    def latest_change_seq(self):
+        with self.connection() as conn:
+            # sqlite_sequence survives pruning, unlike MAX(seq) over an emptied log.
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, seq=0, limit=1000, tables=None):
+        """Return up to ``limit`` change_log entries after ``seq``, oldest first.
+
+        Each entry is ``{seq, table, row_id, op, changed_at}``; pass the last
+        ``seq`` back in to continue. ``tables`` restricts the result to the
+        given table names.
+        """
+        params = [seq]
+        table_filter = ""
+        if tables:
+            table_filter = f"AND table_name IN ({', '.join('?' * len(tables))})"
+            params.extend(tables)
+        params.append(limit)
+        try:
+            with self.connection() as conn:
+                rows = conn.execute(f"""
+                    SELECT seq, table_name AS "table", row_id, op, changed_at
+                    FROM change_log
+                    WHERE seq > ? {table_filter}
+                    ORDER BY seq
+                    LIMIT ?
+                """, params).fetchall()
+            return [dict(row) for row in rows]
+        except sqlite3.Error as e:
+            Logger.error(f"Error reading change log: {e}")
+            return []
+
+    def prune_change_log(self, through_seq=None, older_than_days=None):
+        """Delete change_log entries up to ``through_seq`` and/or older than ``older_than_days``.
+
+        Returns the number of entries removed. Consumers that fall behind the
+        pruned range should do a full reload.
+        """
+        conditions, params = [], []
+        if through_seq is not None:
+            conditions.append("seq <= ?")
+            params.append(through_seq)
+        if older_than_days is not None:
+            conditions.append("changed_at < datetime('now', ?)")
+            params.append(f"-{int(older_than_days)} days")
+        if not conditions:
+            return 0
+        with self.connection() as conn:
+            return conn.execute(f"DELETE FROM change_log WHERE {' OR '.join(conditions)}", params).rowcount
 
     # --- Clean-up ---
 
@@ -526,7 +1187,7 @@ class Database:
         try:
             print("🔴 DB connection closed! Called from:")
             traceback.print_stack()
-            self.conn.close()
+            self.executor.shutdown()
+            self.pool.close_all()
         except sqlite3.Error as e:
             print(f"❌ Error closing database connection: {e}")
-
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.logger import Logger
+from kivy.properties import BooleanProperty
+
+
+class DBExecutor:
+    """Runs Database work on a small pool of worker threads.
+
+    Each worker gets its own SQLite connection from the Database's
+    ConnectionManager the first time it touches the database. ``submit``
+    returns a ``concurrent.futures.Future``; ``on_done(result)`` and
+    ``on_error(exc)`` are called on the Kivy main thread at the next frame,
+    so screens can touch widgets from them.
+    """
+
+    def __init__(self, db, workers=2):
+        self.db = db
+        self.workers = workers
+        self._executor = None
+
+    def submit(self, func, *args, on_done=None, on_error=None, **kwargs):
+        if self._executor is None:
+            # Threads are only started once something is submitted, so
+            # command-line tools that never use the executor don't pay for it.
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='db-worker')
+        future = self._executor.submit(func, *args, **kwargs)
+        future.add_done_callback(lambda f: self._dispatch(f, on_done, on_error))
+        return future
+
+    def _dispatch(self, future, on_done, on_error):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            Logger.error(f"DBExecutor: {error}")
+            if on_error:
+                Clock.schedule_once(lambda dt: on_error(error))
+        elif on_done:
+            result = future.result()
+            Clock.schedule_once(lambda dt: on_done(result))
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+class LoadingMixin:
+    """Loading state for screens that fetch data through ``db.executor``.
+
+    ``loading`` is True while any request started with ``run_db`` is
+    outstanding, so kv rules can show a spinner or disable buttons. When a
+    ``key`` is given, only the most recent request with that key delivers
+    its result; older ones (e.g. a previous filter) are dropped.
+    """
+    loading = BooleanProperty(False)
+
+    def run_db(self, func, *args, on_done=None, on_error=None, key=None, **kwargs):
+        if not hasattr(self, '_pending_loads'):
+            self._pending_loads = 0
+            self._latest_loads = {}
+        self._pending_loads += 1
+        self.loading = True
+        token = object()
+        if key is not None:
+            self._latest_loads[key] = token
+
+        def finish(callback, value):
+            self._pending_loads -= 1
+            self.loading = self._pending_loads > 0
+            if key is not None and self._latest_loads.get(key) is not token:
+                return
+            if callback:
+                callback(value)
+
+        return App.get_running_app().db.executor.submit(
+            func, *args,
+            on_done=lambda result: finish(on_done, result),
+            on_error=lambda error: finish(on_error, error),
+            **kwargs
+        )
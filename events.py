@@ -0,0 +1,73 @@
+import threading
+from collections import namedtuple
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+# Event types published by Database after a change has been committed.
+CATEGORY_ADDED = 'category_added'          # id, name
+CATEGORY_DELETED = 'category_deleted'      # id
+MENU_ITEM_ADDED = 'menu_item_added'        # id, name, price, category_id
+MENU_ITEM_DELETED = 'menu_item_deleted'    # id
+INVENTORY_CHANGED = 'inventory_changed'    # name, quantity (None once deleted)
+STOCK_CHANGED = 'stock_changed'            # menu_item_ids
+ORDER_CREATED = 'order_created'            # id, user_id
+ORDER_STATUS_CHANGED = 'order_status_changed'  # id, status
+ORDERS_CLEARED = 'orders_cleared'
+USER_ADDED = 'user_added'                  # id, username, role
+USER_DELETED = 'user_deleted'              # id
+
+MENU_EVENTS = (CATEGORY_ADDED, CATEGORY_DELETED, MENU_ITEM_ADDED, MENU_ITEM_DELETED)
+
+Event = namedtuple('Event', 'type data')
+
+
+class EventBus:
+    """Delivers Database change events to screens once per frame.
+
+    ``publish`` may be called from any thread. Events are queued and handed
+    to subscribers on the Kivy main thread at the next frame, each
+    subscriber getting one call with the list of events it asked for, so a
+    burst of changes costs one widget update. Events nobody listens to are
+    dropped straight away, so headless tools never build up a backlog.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._pending = []
+        self._scheduled = False
+
+    def subscribe(self, event_types, callback):
+        """Call ``callback(events)`` for events whose type is in ``event_types``."""
+        if isinstance(event_types, str):
+            event_types = (event_types,)
+        with self._lock:
+            self._subscribers.append((frozenset(event_types), callback))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [(types, cb) for types, cb in self._subscribers if cb != callback]
+
+    def publish(self, event_type, **data):
+        with self._lock:
+            if not any(event_type in types for types, _ in self._subscribers):
+                return
+            self._pending.append(Event(event_type, data))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        Clock.schedule_once(self._flush)
+
+    def _flush(self, dt=None):
+        with self._lock:
+            events, self._pending = self._pending, []
+            subscribers = list(self._subscribers)
+            self._scheduled = False
+        for types, callback in subscribers:
+            matching = [event for event in events if event.type in types]
+            if not matching:
+                continue
+            try:
+                callback(matching)
+            except Exception as e:
+                Logger.error(f"EventBus: subscriber {callback!r} failed: {e}")
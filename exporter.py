@@ -0,0 +1,229 @@
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+EXPORT_FOLDER = 'data/excel_receipts'
+EXPORT_COLUMNS = ['Order ID', 'Timestamp', 'User', 'Item Name', 'Quantity', 'Price']
+
+
+class CsvExportWriter:
+    extension = 'csv'
+
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+
+    def write_header(self, columns):
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class JsonLinesExportWriter:
+    extension = 'jsonl'
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.keys = None
+
+    def write_header(self, columns):
+        self.keys = [column.lower().replace(' ', '_') for column in columns]
+
+    def write_rows(self, rows):
+        self.stream.writelines(json.dumps(dict(zip(self.keys, row))) + "\n" for row in rows)
+
+    def close(self):
+        pass
+
+
+class XlsxExportWriter:
+    """Minimal streaming .xlsx writer.
+
+    Rows go straight into the worksheet entry of the zip as inline strings,
+    so nothing but the current batch is ever held in memory.
+    """
+    extension = 'xlsx'
+    binary = True
+
+    CONTENT_TYPES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    )
+    ROOT_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )
+    WORKBOOK = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Orders" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+    WORKBOOK_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+
+    def __init__(self, stream):
+        self.zip = zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED)
+        self.zip.writestr('[Content_Types].xml', self.CONTENT_TYPES)
+        self.zip.writestr('_rels/.rels', self.ROOT_RELS)
+        self.zip.writestr('xl/workbook.xml', self.WORKBOOK)
+        self.zip.writestr('xl/_rels/workbook.xml.rels', self.WORKBOOK_RELS)
+        self.sheet = io.TextIOWrapper(self.zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True),
+                                      encoding='utf-8')
+        self.sheet.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                         '<sheetData>')
+
+    @staticmethod
+    def _cell(value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f'<c><v>{value}</v></c>'
+        return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+    def write_header(self, columns):
+        self.write_rows([columns])
+
+    def write_rows(self, rows):
+        self.sheet.write(''.join('<row>' + ''.join(map(self._cell, row)) + '</row>' for row in rows))
+
+    def close(self):
+        self.sheet.write('</sheetData></worksheet>')
+        self.sheet.close()
+        self.zip.close()
+
+
+EXPORT_FORMATS = {
+    'csv': CsvExportWriter,
+    'jsonl': JsonLinesExportWriter,
+    'xlsx': XlsxExportWriter,
+}
+
+
+def _reserve_path(folder, stem, suffix):
+    """Claim ``stem + suffix`` (or ``stem_N + suffix`` if taken) by creating it empty; returns the path."""
+    number = 0
+    while True:
+        path = os.path.join(folder, f"{stem}_{number}{suffix}" if number else f"{stem}{suffix}")
+        try:
+            open(path, 'x').close()
+            return path
+        except FileExistsError:
+            number += 1
+
+
+def export_orders(db, fmt='csv', start=None, end=None, compress=False, folder=EXPORT_FOLDER,
+                  progress=None, batch_size=500):
+    """Stream order lines in ``[start, end)`` to a new file and return its path.
+
+    ``progress(done, total)`` is called after every batch. ``compress`` gzips
+    CSV and JSON Lines output; .xlsx is already a zip, so it is ignored there.
+    The file is written under a temporary name and renamed when complete;
+    exports started in the same second get numbered names instead of
+    overwriting each other.
+    """
+    writer_class = EXPORT_FORMATS[fmt]
+    binary = getattr(writer_class, 'binary', False)
+    compress = compress and not binary
+
+    os.makedirs(folder, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = _reserve_path(folder, f"order_history_{stamp}",
+                         f".{writer_class.extension}" + (".gz" if compress else ""))
+    partial = path + '.part'
+
+    # One snapshot for the count and the rows, so orders placed mid-export
+    # neither skew the progress total nor slip into a half-written file.
+    with db.read_transaction():
+        total = db.count_export_rows(start, end)
+        done = 0
+        try:
+            raw = gzip.open(partial, 'wb') if compress else open(partial, 'wb')
+            with raw:
+                stream = raw if binary else io.TextIOWrapper(raw, encoding='utf-8', newline='')
+                writer = writer_class(stream)
+                writer.write_header(EXPORT_COLUMNS)
+                for rows in db.iter_export_rows(start, end, batch_size):
+                    writer.write_rows(rows)
+                    done += len(rows)
+                    if progress:
+                        progress(done, total)
+                writer.close()
+                if not binary:
+                    stream.flush()
+                    stream.detach()
+            os.replace(partial, path)
+        except BaseException:
+            for leftover in (partial, path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+    return path
+
+
+class ExportJob:
+    """Runs export_orders on a worker thread and reports back through Clock.
+
+    ``on_progress(done, total)``, ``on_done(path)`` and ``on_error(exc)`` are
+    always called on the Kivy main thread.
+    """
+
+    def __init__(self, db, fmt='csv', start=None, end=None, compress=False,
+                 on_progress=None, on_done=None, on_error=None):
+        self.db = db
+        self.fmt = fmt
+        self.start = start
+        self.end = end
+        self.compress = compress
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.thread = threading.Thread(target=self._run, name='order-export', daemon=True)
+
+    def begin(self):
+        self.thread.start()
+        return self
+
+    def _dispatch(self, callback, *args):
+        if callback:
+            Clock.schedule_once(lambda dt: callback(*args))
+
+    def _run(self):
+        try:
+            path = export_orders(self.db, self.fmt, self.start, self.end, self.compress,
+                                 progress=lambda done, total: self._dispatch(self.on_progress, done, total))
+            Logger.info(f"Export: wrote {path}")
+            self._dispatch(self.on_done, path)
+        except Exception as e:
+            Logger.error(f"Export failed: {e}")
+            self._dispatch(self.on_error, e)
+        finally:
+            self.db.pool.release()
@@ -0,0 +1,121 @@
+"""Loopback load test for the order hub.
+
+Starts an OrderHub on 127.0.0.1 against a scratch database, seeds a small
+menu, then lets many simulated terminals submit orders concurrently and
+checks that every unit of stock sold is accounted for, e.g.
+
+    python hub_loadtest.py --terminals 300 --orders 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from database import Database
+from order_hub import OrderHub, OrderHubClient
+
+MENU = [('Burger', 2.50), ('Fries', 1.25), ('Soda', 1.00), ('Salad', 3.75)]
+
+
+def seed(db, stock):
+    """Create a cashier and a small menu; returns ``(user_id, menu item ids)``."""
+    db.auth.create_user('loadtest', 'loadtest', 'user')
+    user_id = db.get_user_by_username('loadtest')['id']
+    db.add_category('Load test')
+    category_id = db.get_categories()[-1]['id']
+    for name, price in MENU:
+        db.add_menu_item(price, category_id, name)
+        db.add_or_update_inventory_item(name, stock)
+    return user_id, [item['id'] for item in db.catalog.get_items(category_id)]
+
+
+async def terminal(host, port, user_id, item_ids, orders, latencies):
+    stock_events = []
+
+    def on_event(message):
+        if message.get('event') == 'stock':
+            stock_events.append(message)
+
+    client = await OrderHubClient(on_event=on_event).connect(host, port)
+    placed = {}
+    accepted = 0
+    try:
+        await client.get_menu()
+        for _ in range(orders):
+            lines = [[menu_item_id, random.randint(1, 3)] for menu_item_id in random.sample(item_ids, 2)]
+            started = time.perf_counter()
+            order_id, shortages = await client.submit_order(user_id, lines)
+            latencies.append(time.perf_counter() - started)
+            if order_id:
+                accepted += 1
+                for menu_item_id, quantity in lines:
+                    placed[menu_item_id] = placed.get(menu_item_id, 0) + quantity
+    finally:
+        await client.close()
+    return placed, accepted, len(stock_events)
+
+
+async def run(args):
+    folder = tempfile.mkdtemp(prefix='hub_loadtest_')
+    db = Database(os.path.join(folder, 'restaurant.db'))
+    user_id, item_ids = seed(db, args.stock)
+    hub = await OrderHub(db, max_batch=args.max_batch).start('127.0.0.1', 0)
+    host, port = hub.address
+
+    latencies = []
+    started = time.perf_counter()
+    results = await asyncio.gather(*(terminal(host, port, user_id, item_ids, args.orders, latencies)
+                                     for _ in range(args.terminals)))
+    elapsed = time.perf_counter() - started
+    await hub.close()
+
+    sold = {}
+    for placed, _, _ in results:
+        for menu_item_id, quantity in placed.items():
+            sold[menu_item_id] = sold.get(menu_item_id, 0) + quantity
+    db.catalog.invalidate()
+    mismatches = [
+        (item['name'], args.stock - sold.get(item['id'], 0), item['quantity'])
+        for item in (db.catalog.get_item(menu_item_id) for menu_item_id in item_ids)
+        if item['quantity'] != args.stock - sold.get(item['id'], 0)
+    ]
+    db.close()
+
+    latencies.sort()
+    submitted = len(latencies)
+    accepted = sum(count for _, count, _ in results)
+    stock_events = sum(count for _, _, count in results)
+    print(f"{args.terminals} terminals, {submitted} submissions in {elapsed:.2f}s "
+          f"({submitted / elapsed:.0f}/s)")
+    print(f"latency p50 {latencies[submitted // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(submitted * 0.99)] * 1000:.1f} ms")
+    print(f"{hub.stats['orders']} orders in {hub.stats['batches']} commits "
+          f"(largest batch {hub.stats['largest_batch']}), "
+          f"{accepted} accepted, {stock_events} stock events delivered")
+    if not accepted or not stock_events:
+        print("FAILED: no orders were accepted" if not accepted else "FAILED: no stock events arrived")
+        return 1
+    if mismatches:
+        for name, expected, actual in mismatches:
+            print(f"STOCK MISMATCH {name}: expected {expected}, found {actual}")
+        return 1
+    print("Stock reconciles with accepted orders.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terminals', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=10, help="orders per terminal")
+    parser.add_argument('--stock', type=int, default=5000, help="starting stock per item")
+    parser.add_argument('--max-batch', type=int, default=64)
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,15 @@
+import time
+_PROCESS_START = time.perf_counter()
+
 from kivy.app import App
-from kivy.uix.screenmanager import ScreenManager, Screen, SlideTransition
-from kivy.lang import Builder
+from kivy.uix.screenmanager import Screen, SlideTransition
 from kivy.core.window import Window
 from kivy.properties import StringProperty, ListProperty, NumericProperty, BooleanProperty
 from kivy.clock import Clock
-from restaurant_pos.screens.edit_menu_screen import EditMenuScreen
-from restaurant_pos.screens.order_screen import OrderScreen
-from restaurant_pos.screens.inventory_screen import InventoryScreen
-from restaurant_pos.screens.order_history_screen import OrderHistoryScreen
-from restaurant_pos.screens.user_login_screen import UserLoginScreen
-from restaurant_pos.screens.superadmin_login_screen import SuperAdminLoginScreen
-from restaurant_pos.screens.admin_login_screen import AdminLoginScreen
-from restaurant_pos.screens.create_account_screen import CreateAccountScreen
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.popup import Popup
 from kivy.uix.boxlayout import BoxLayout
-from restaurant_pos.screens.manage_accounts_screen import ManageAccountsScreen
 from kivy.clock import Clock
 from kivy.metrics import Metrics
 from kivy.utils import platform
@@ -27,14 +20,35 @@ import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), 'data'))
 from database import Database
-import hashlib
+from screen_registry import LazyScreenManager, StartupTimeline
+from sessions import SessionManager
+from receipts import ReceiptPrinter
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+startup_timeline = StartupTimeline(_PROCESS_START)
 
 # Set window size for tablet (you can adjust this)
 Window.size = (1024, 600)
-Builder.load_file("main.kv")
+startup_timeline.mark('imports and window')
+
+# Screens are imported, built and have their kv/ rules loaded the first time
+# they are shown. SplashScreen, LoginScreen and HomeScreen are added in build().
+SCREENS = [
+    ('edit_menu', 'restaurant_pos.screens.edit_menu_screen:EditMenuScreen', 'edit_menu.kv'),
+    ('order_screen', 'restaurant_pos.screens.order_screen:OrderScreen', 'order.kv'),
+    ('inventory', 'restaurant_pos.screens.inventory_screen:InventoryScreen', 'inventory.kv'),
+    ('order_history', 'restaurant_pos.screens.order_history_screen:OrderHistoryScreen', 'order_history.kv'),
+    ('kitchen', 'restaurant_pos.screens.kitchen_screen:KitchenScreen', 'kitchen.kv'),
+    ('superadmin_login', 'restaurant_pos.screens.superadmin_login_screen:SuperAdminLoginScreen',
+     'superadmin_login.kv'),
+    ('user_login_screen', 'restaurant_pos.screens.user_login_screen:UserLoginScreen', 'user_login.kv'),
+    ('admin_login_screen', 'restaurant_pos.screens.admin_login_screen:AdminLoginScreen', 'admin_login.kv'),
+    ('create_account_screen', 'restaurant_pos.screens.create_account_screen:CreateAccountScreen',
+     'create_account.kv'),
+    ('manage_accounts_screen', 'restaurant_pos.screens.manage_accounts_screen:ManageAccountsScreen',
+     'manage_accounts.kv'),
+    ('lock', 'restaurant_pos.screens.lock_screen:LockScreen', 'lock.kv'),
+    ('analytics', 'restaurant_pos.screens.analytics_screen:AnalyticsScreen', 'analytics.kv'),
+]
 
 
 class SplashScreen(Screen):
@@ -42,20 +56,29 @@ class SplashScreen(Screen):
         threading.Thread(target=self.load_app).start()
 
     def load_app(self):
+        app = App.get_running_app()
         try:
-            app = App.get_running_app()
-            app.db.initialize()  # ✅ Already in place
             app.load_settings()  # ✅ Loads JSON
+            app.db.auth.configure(app.settings)
+            app.sessions.configure(app.settings)
+            app.receipts = ReceiptPrinter(app.db, app.settings)
+            startup_timeline.mark('settings loaded')
             app.create_required_folders()  # ✅ Checks folders
+            app.create_default_accounts()
+            startup_timeline.mark('folders and default accounts')
         except Exception as e:
             print(f"❌ Error during splash loading: {e}")
         finally:
-            Clock.schedule_once(self.go_to_next_screen, 2)  # slight delay for user experience
+            app.db.pool.release()  # this thread is about to exit
+            # Move on as soon as initialization is done; no artificial delay.
+            Clock.schedule_once(self.go_to_next_screen)
 
     def go_to_next_screen(self, dt=None):
         app = App.get_running_app()
         target_screen = app.settings.get("startup_screen", "login")
         self.manager.current = target_screen
+        # The next frame is the first one that shows the target screen.
+        Clock.schedule_once(lambda dt: startup_timeline.finish(f"'{target_screen}' screen shown"))
 
 
 
@@ -84,6 +107,7 @@ class HomeScreen(Screen):
             # Enable/disable buttons by role
             self.ids.edit_menu_btn.disabled = role not in ['admin', 'super_admin']
             self.ids.inventory_btn.disabled = role not in ['admin', 'super_admin']
+            self.ids.analytics_btn.disabled = role not in ['admin', 'super_admin']
             self.ids.order_history_btn.disabled = role not in ['admin', 'super_admin']
         else:
             self.username = "Guest"
@@ -109,6 +133,10 @@ class HomeScreen(Screen):
             manage_btn.bind(on_release=lambda x: self.go_to_manage_accounts(popup))
             layout.add_widget(manage_btn)
 
+        switch_btn = Button(text='Switch Cashier', size_hint_y=None, height=40)
+        switch_btn.bind(on_release=lambda x: self.switch_cashier(popup))
+        layout.add_widget(switch_btn)
+
         logout_btn = Button(text='Logout', size_hint_y=None, height=40)
         logout_btn.bind(on_release=lambda x: self.logout(popup))
         layout.add_widget(logout_btn)
@@ -123,9 +151,15 @@ class HomeScreen(Screen):
         popup.dismiss()
         self.manager.current = 'create_account_screen'
 
+    def switch_cashier(self, popup):
+        popup.dismiss()
+        App.get_running_app().lock_terminal()
+
     def logout(self, popup):
         popup.dismiss()
-        App.get_running_app().current_user = None
+        app = App.get_running_app()
+        app.sessions.end(app.current_user['id'])
+        app.current_user = None
         self.manager.current = 'login'
 
 if platform == 'android':
@@ -137,7 +171,10 @@ class RestaurantApp(App):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.db = Database()
+        startup_timeline.mark('database opened and migrated')
         self.current_user = None  # ✅ Initialize current_user here
+        self.sessions = SessionManager()
+        self.receipts = None  # set up once settings are loaded
         self.settings = {}  # <-- we'll store loaded settings here
 
     def load_settings(self):
@@ -158,48 +195,67 @@ class RestaurantApp(App):
         print("Screen Size:", Window.size[0], "x", Window.size[1])
 
 
-        self.create_default_superadmin()
         # Create screen manager with proper transition
-        self.sm = ScreenManager(transition=SlideTransition())
-
-        self.sm.add_widget(SplashScreen(name='splash'))
-
-
-        # Add screens
-        screens = [
-            LoginScreen(name='login'),
-            HomeScreen(name='home'),
-            EditMenuScreen(name='edit_menu'),
-            OrderScreen(name='order_screen'),
-            InventoryScreen(name='inventory'),
-            OrderHistoryScreen(name='order_history'),
-            SuperAdminLoginScreen(name='superadmin_login'),
-            UserLoginScreen(name='user_login_screen'),
-            AdminLoginScreen(name='admin_login_screen'),
-            CreateAccountScreen(name='create_account_screen', db=self.db),
-            ManageAccountsScreen(name='manage_accounts_screen')
-        ]
+        self.sm = LazyScreenManager(timeline=startup_timeline, transition=SlideTransition())
+
+        self.sm.register('splash', SplashScreen, 'splash.kv')
+        self.sm.register('login', LoginScreen, 'login.kv')
+        self.sm.register('home', HomeScreen, 'home.kv')
+        for name, screen_class, kv_file in SCREENS:
+            kwargs = {'db': self.db} if name == 'create_account_screen' else {}
+            self.sm.register(name, screen_class, kv_file, **kwargs)
 
-        for screen in screens:
-            self.sm.add_widget(screen)
+        # Start from the splash screen
+        self.sm.current = 'splash'
 
-            # Start from the splash screen
-            self.sm.current = 'splash'
 
 
+        Window.bind(on_touch_down=self._on_activity)
+        Clock.schedule_interval(self._check_idle, 15)
 
         Clock.schedule_once(self.request_storage_permission, 1)
         return self.sm
 
-    def create_default_superadmin(self):
-        conn = self.db.conn
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username = ?", ('Tristan',))
-        if not cursor.fetchone():
-            self.db.create_user('Tristan', hash_password('malupit123'), 'super_admin')
+    def sign_in(self, user):
+        """Finish a full password login and show the cashier their quick-switch PIN."""
+        self.current_user = user
+        pin = self.sessions.start(user)
+        Popup(
+            title='Quick-switch PIN',
+            content=Label(text=f"Your PIN is {pin}\nUse it to unlock this terminal until you log out."),
+            size_hint=(None, None),
+            size=(400, 200)
+        ).open()
+
+    def lock_terminal(self):
+        if self.current_user is None or self.sm.current == 'lock':
+            return
+        lock_screen = self.sm.get_screen('lock')
+        lock_screen.return_to = self.sm.current
+        lock_screen.locked_by = self.current_user['id']
+        self.current_user = None
+        self.sm.current = 'lock'
+
+    def _on_activity(self, window, touch):
+        if self.current_user:
+            self.sessions.touch(self.current_user['id'])
+
+    def _check_idle(self, dt):
+        if not self.current_user:
+            return
+        idle = self.sessions.idle_for(self.current_user['id'])
+        if idle is None or idle >= self.sessions.auto_lock_after:
+            self.lock_terminal()
+
+    def create_default_accounts(self):
+        # After auth.configure, so they are hashed at the configured cost.
+        self.db.auth.create_user('Tristan', 'malupit123', 'super_admin')
+        self.db.auth.create_user('admin', 'password', 'admin')
 
     def on_stop(self):
         # Close database connection when app stops
+        if self.receipts is not None:
+            self.receipts.stop()
         self.db.close()
 
     def has_permission(self, screen_name):
@@ -207,18 +263,22 @@ class RestaurantApp(App):
             return False
         role = self.current_user['role']
         access = {
-            'user': ['OrderScreen', 'OrderHistoryScreen'],
-            'admin': ['OrderScreen', 'OrderHistoryScreen', 'EditMenuScreen', 'InventoryScreen'],
-            'super_admin': ['OrderScreen', 'OrderHistoryScreen', 'EditMenuScreen', 'InventoryScreen',
-                            'CreateAccountScreen']
+            'user': ['OrderScreen', 'OrderHistoryScreen', 'KitchenScreen'],
+            'admin': ['OrderScreen', 'OrderHistoryScreen', 'EditMenuScreen', 'InventoryScreen', 'KitchenScreen',
+                      'AnalyticsScreen'],
+            'super_admin': ['OrderScreen', 'OrderHistoryScreen', 'EditMenuScreen', 'InventoryScreen', 'KitchenScreen',
+                            'AnalyticsScreen', 'CreateAccountScreen', 'ManageAccountsScreen']
         }
         return screen_name in access.get(role, [])
 
     def create_required_folders(self):
         folders = [
             "data/images",
-            "data/backups"
-            "data/excel_receipts"
+            "data/backups",
+            "data/excel_receipts",
+            "data/spool",
+            "data/journal",
+            "data/analytics_cache"
         ]
         for folder in folders:
             os.makedirs(folder, exist_ok=True)
@@ -0,0 +1,77 @@
+"""Maintenance commands for the POS database.
+
+Run from the project folder, e.g. ``python manage.py rebuild-rollups``.
+"""
+import argparse
+import os
+import sys
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from database import Database
+from receipt_journal import JOURNAL_FOLDER, ReceiptJournal
+
+
+def rebuild_rollups(db, args):
+    days = db.rebuild_sales_rollups()
+    print(f"Rebuilt sales rollups for {days} day(s).")
+
+
+def prune_change_log(db, args):
+    removed = db.prune_change_log(older_than_days=args.days)
+    print(f"Removed {removed} change log entries older than {args.days} day(s).")
+
+
+def verify_journal(db, args):
+    checked, problems = ReceiptJournal(args.journal).verify()
+    for problem in problems:
+        print(problem)
+    print(f"Checked {checked} receipt(s), {len(problems)} problem(s).")
+    return 1 if problems else 0
+
+
+def rebuild_journal_index(db, args):
+    indexed = ReceiptJournal(args.journal).rebuild_index()
+    print(f"Indexed receipts for {indexed} order(s).")
+
+
+COMMANDS = {
+    'rebuild-rollups': (rebuild_rollups, "Recompute daily, hourly and per-item sales rollups from order history"),
+    'prune-change-log': (prune_change_log, "Delete old change log entries"),
+    'verify-journal': (verify_journal, "Check receipt journal records and the reprint index"),
+    'rebuild-journal-index': (rebuild_journal_index, "Rebuild the receipt reprint index from the journal files"),
+}
+
+# Extra arguments per command, as (flags, add_argument keyword arguments).
+COMMAND_ARGUMENTS = {
+    'prune-change-log': [
+        (('--days',), {'type': int, 'default': 30, 'help': "keep this many days of changes (default: %(default)s)"}),
+    ],
+    'verify-journal': [
+        (('--journal',), {'default': JOURNAL_FOLDER, 'help': "journal folder (default: %(default)s)"}),
+    ],
+    'rebuild-journal-index': [
+        (('--journal',), {'default': JOURNAL_FOLDER, 'help': "journal folder (default: %(default)s)"}),
+    ],
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='data/restaurant.db', help="database file (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        for flags, options in COMMAND_ARGUMENTS.get(name, []):
+            subparser.add_argument(*flags, **options)
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        return COMMANDS[args.command][0](db, args)
+    finally:
+        db.pool.close_all()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import threading
+
+
+class MenuCatalog:
+    """In-memory snapshot of categories, menu items, prices and stock.
+
+    Loaded lazily with one joined query and kept current by Database, which
+    invalidates it after menu/inventory edits and patches stock in place
+    after orders, so browsing the menu never touches SQLite.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.categories = []
+        self.items_by_id = {}
+        self.items_by_category = {}
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+    def _load(self):
+        categories = {}
+        items_by_id = {}
+        items_by_category = {}
+        for row in self.db.load_menu_snapshot():
+            category_id = row['category_id']
+            if category_id not in categories:
+                categories[category_id] = {'id': category_id, 'name': row['category_name']}
+                items_by_category[category_id] = []
+            if row['menu_item_id'] is None:
+                continue
+            item = {
+                'id': row['menu_item_id'],
+                'name': row['name'],
+                'price': row['price'],
+                'category_id': category_id,
+                'inventory_id': row['inventory_id'],
+                'quantity': row['quantity'] if row['inventory_id'] is not None else None
+            }
+            items_by_id[item['id']] = item
+            items_by_category[category_id].append(item)
+
+        self.categories = list(categories.values())
+        self.items_by_id = items_by_id
+        self.items_by_category = items_by_category
+        self._loaded = True
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def get_categories(self):
+        self._ensure_loaded()
+        return self.categories
+
+    def get_items(self, category_id):
+        self._ensure_loaded()
+        return self.items_by_category.get(category_id, [])
+
+    def get_item(self, menu_item_id):
+        self._ensure_loaded()
+        return self.items_by_id.get(menu_item_id)
+
+    def apply_stock_deltas(self, deltas):
+        """Patch stock for ``{menu_item_id: change}`` without reloading.
+
+        The change lands on the item's inventory record, so every menu item
+        sharing that record is updated.
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            by_inventory = {}
+            for menu_item_id, change in deltas.items():
+                item = self.items_by_id.get(menu_item_id)
+                if item is None or item['quantity'] is None:
+                    self._loaded = False
+                    return
+                by_inventory[item['inventory_id']] = by_inventory.get(item['inventory_id'], 0) + change
+            for item in self.items_by_id.values():
+                if item['inventory_id'] in by_inventory:
+                    item['quantity'] += by_inventory[item['inventory_id']]
+
+    @staticmethod
+    def in_stock(item):
+        return item['quantity'] is not None and item['quantity'] > 0
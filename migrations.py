@@ -0,0 +1,264 @@
+import sqlite3
+import time
+from kivy.logger import Logger
+from utils import register_sql_functions
+
+
+def _run_script(conn, script):
+    # executescript() commits first, which would break the per-migration
+    # transaction, so statements are fed one at a time instead.
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        raise sqlite3.ProgrammingError(f"Incomplete SQL statement in migration: {statement!r}")
+
+
+def _initial_schema(conn):
+    _run_script(conn, '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL DEFAULT 'user' CHECK(role IN ('user', 'admin', 'super_admin'))
+        );
+
+        CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            quantity INTEGER,
+            menu_item_id INTEGER UNIQUE,
+            FOREIGN KEY (menu_item_id) REFERENCES menu_items(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS menu_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            category_id INTEGER,
+            FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'open',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        );
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            menu_item_id INTEGER,
+            quantity INTEGER DEFAULT 1,
+            FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
+            FOREIGN KEY (menu_item_id) REFERENCES menu_items(id) ON DELETE CASCADE
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_menu_items_category_id ON menu_items(category_id);
+        CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
+        CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+    ''')
+    # Default accounts are seeded by RestaurantApp.create_default_accounts.
+
+
+def _index_orders_created_at(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at)")
+
+
+def _sales_rollups(conn):
+    _run_script(conn, '''
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            day TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            revenue_cents INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS hourly_sales (
+            day TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            revenue_cents INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, hour)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS item_sales_daily (
+            day TEXT NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue_cents INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, menu_item_id)
+        ) WITHOUT ROWID;
+
+        DELETE FROM daily_sales;
+        DELETE FROM hourly_sales;
+        DELETE FROM item_sales_daily;
+
+        INSERT INTO daily_sales (day, order_count, item_count, revenue_cents)
+        SELECT date(o.created_at, 'localtime'), COUNT(DISTINCT o.id), SUM(oi.quantity),
+               SUM(oi.quantity * to_cents(m.price))
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        JOIN menu_items m ON m.id = oi.menu_item_id
+        GROUP BY 1;
+
+        INSERT INTO hourly_sales (day, hour, order_count, item_count, revenue_cents)
+        SELECT date(o.created_at, 'localtime'), CAST(strftime('%H', o.created_at, 'localtime') AS INTEGER),
+               COUNT(DISTINCT o.id), SUM(oi.quantity),
+               SUM(oi.quantity * to_cents(m.price))
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        JOIN menu_items m ON m.id = oi.menu_item_id
+        GROUP BY 1, 2;
+
+        INSERT INTO item_sales_daily (day, menu_item_id, quantity, revenue_cents)
+        SELECT date(o.created_at, 'localtime'), oi.menu_item_id, SUM(oi.quantity),
+               SUM(oi.quantity * to_cents(m.price))
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        JOIN menu_items m ON m.id = oi.menu_item_id
+        GROUP BY 1, 2;
+    ''')
+
+
+def _order_price_snapshots(conn):
+    # Rebuilt rather than altered: menu_item_id becomes ON DELETE SET NULL so
+    # deleting a menu item no longer takes its sales history with it.
+    _run_script(conn, '''
+        CREATE TABLE order_items_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            menu_item_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER DEFAULT 1,
+            unit_price INTEGER NOT NULL DEFAULT 0,
+            line_total INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
+            FOREIGN KEY (menu_item_id) REFERENCES menu_items(id) ON DELETE SET NULL
+        );
+
+        INSERT INTO order_items_new (id, order_id, menu_item_id, item_name, quantity, unit_price, line_total)
+        SELECT oi.id, oi.order_id, oi.menu_item_id, m.name, oi.quantity,
+               to_cents(COALESCE(m.price, 0)),
+               oi.quantity * to_cents(COALESCE(m.price, 0))
+        FROM order_items oi
+        LEFT JOIN menu_items m ON m.id = oi.menu_item_id;
+
+        DROP TABLE order_items;
+        ALTER TABLE order_items_new RENAME TO order_items;
+        CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+
+        ALTER TABLE orders ADD COLUMN total_cents INTEGER NOT NULL DEFAULT 0;
+        UPDATE orders
+        SET total_cents = COALESCE((SELECT SUM(line_total) FROM order_items WHERE order_id = orders.id), 0);
+    ''')
+
+
+def _change_log(conn):
+    # Dropping or rebuilding one of these tables drops its triggers too, so a
+    # later migration that does so must recreate them.
+    _run_script(conn, '''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('insert', 'update', 'delete')),
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+    for table in ('menu_items', 'categories', 'inventory', 'orders', 'order_items'):
+        for op, event, row in (('insert', 'INSERT', 'NEW'), ('update', 'UPDATE', 'NEW'), ('delete', 'DELETE', 'OLD')):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_change_log_{op} AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{op}');
+                END
+            ''')
+
+
+def _kitchen_queue(conn):
+    # Nothing ever moved an order past 'open' before, so everything already
+    # on file is treated as done rather than flooding the kitchen queue.
+    _run_script(conn, '''
+        ALTER TABLE orders ADD COLUMN preparing_at TIMESTAMP;
+        ALTER TABLE orders ADD COLUMN ready_at TIMESTAMP;
+        ALTER TABLE orders ADD COLUMN served_at TIMESTAMP;
+        ALTER TABLE orders ADD COLUMN closed_at TIMESTAMP;
+        ALTER TABLE categories ADD COLUMN station TEXT NOT NULL DEFAULT 'kitchen';
+
+        UPDATE orders SET status = 'closed', closed_at = created_at WHERE status IS NOT 'closed';
+
+        CREATE INDEX IF NOT EXISTS idx_orders_active ON orders(created_at, id) WHERE status != 'closed';
+    ''')
+
+
+# Append new migrations to the end; never edit or renumber one that has shipped.
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "index orders.created_at", _index_orders_created_at),
+    (3, "sales rollup tables", _sales_rollups),
+    (4, "price snapshots and stored totals", _order_price_snapshots),
+    (5, "change log triggers", _change_log),
+    (6, "kitchen queue statuses and stations", _kitchen_queue),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION and return the resulting version.
+
+    Each migration runs in its own write transaction together with the
+    ``user_version`` bump, so an interrupted upgrade resumes where it stopped.
+    A current schema costs a single pragma read.
+    """
+    version = get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    register_sql_functions(conn)
+    if conn.in_transaction:
+        conn.commit()
+    # Table rebuilds need foreign keys off, and the pragma is a no-op inside a transaction.
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for number, description, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another terminal may have migrated while we waited for the lock.
+                version = get_schema_version(conn)
+                if number <= version:
+                    conn.rollback()
+                    continue
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            version = number
+            Logger.info(f"Database: applied migration {number} ({description}) "
+                        f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+
+    violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+    if violations:
+        Logger.warning(f"Database: {len(violations)} foreign key violation(s) after migrating")
+    return version
@@ -0,0 +1,345 @@
+"""Order hub: one process that owns the database and serves POS terminals.
+
+Run next to the app, e.g. ``python order_hub.py --db data/restaurant.db``.
+
+Terminals connect over TCP and speak JSON lines. Every request carries an
+``id`` that is echoed back in its reply:
+
+    {"id": 1, "op": "submit", "user_id": 2, "lines": [[5, 2], [7, 1]]}
+    {"id": 1, "ok": true, "order_id": 41, "shortages": []}
+
+    {"id": 2, "op": "menu"}
+    {"id": 2, "ok": true, "categories": [...], "items": [...]}
+
+    {"id": 3, "op": "stock", "items": [5, 7]}
+    {"id": 3, "ok": true, "stock": {"5": 12, "7": 0}}
+
+Messages without an ``id`` are pushed by the hub to every client:
+
+    {"event": "stock", "stock": {"5": 10}}     after each group commit
+    {"event": "menu"}                          the menu or inventory changed
+
+Submissions that arrive together are written in one transaction (one
+savepoint per order) by Database.submit_orders_batch.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from kivy.logger import Logger
+from database import Database, order_line_error
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BATCH = 64
+# How long the committer waits for more submissions before writing a batch.
+BATCH_WINDOW = 0.002
+# How often to look for writes made by other connections (e.g. an admin
+# editing the menu from the Kivy app) so clients can be told to reload.
+CHANGE_POLL_INTERVAL = 1.0
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + "\n").encode()
+
+
+class OrderHub:
+    def __init__(self, db, max_batch=MAX_BATCH, batch_window=BATCH_WINDOW):
+        self.db = db
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        # SQLite work runs on one thread so it never blocks the event loop
+        # and the hub holds a single connection.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='order-hub-db')
+        self.clients = set()
+        self.stats = {'orders': 0, 'batches': 0, 'largest_batch': 0}
+        self._submissions = None
+        self._data_version = None
+        self._tasks = []
+        self.server = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._submissions = asyncio.Queue()
+        self._data_version = await self._run(self._read_data_version)
+        self._tasks = [asyncio.create_task(self._commit_loop()), asyncio.create_task(self._watch_changes())]
+        self.server = await asyncio.start_server(self._serve_client, host, port)
+        Logger.info(f"OrderHub: listening on {self.address}")
+        return self
+
+    @property
+    def address(self):
+        return self.server.sockets[0].getsockname()[:2] if self.server else None
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        for writer in list(self.clients):
+            writer.close()
+        await self._run(self.db.pool.release)
+        self.executor.shutdown(wait=True)
+
+    def _run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    # --- Connections ---
+
+    async def _serve_client(self, reader, writer):
+        self.clients.add(writer)
+        # Requests are answered concurrently. The loop only keeps weak
+        # references to tasks, so hold them here until they finish.
+        answers = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                if not isinstance(request, dict):
+                    writer.write(encode({'ok': False, 'error': "request is not a JSON object"}))
+                    await writer.drain()
+                    continue
+                task = asyncio.create_task(self._answer(request, writer))
+                answers.add(task)
+                task.add_done_callback(answers.discard)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            for task in answers:
+                task.cancel()
+            await asyncio.gather(*answers, return_exceptions=True)
+            writer.close()
+
+    async def _answer(self, request, writer):
+        handler = self.HANDLERS.get(request.get('op'))
+        try:
+            if handler is None:
+                raise ValueError(f"unknown op {request.get('op')!r}")
+            reply = await handler(self, request)
+            reply['ok'] = True
+        except Exception as e:
+            reply = {'ok': False, 'error': str(e)}
+        reply['id'] = request.get('id')
+        if writer.is_closing():
+            return
+        writer.write(encode(reply))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def broadcast(self, message):
+        data = encode(message)
+        for writer in list(self.clients):
+            if writer.is_closing():
+                self.clients.discard(writer)
+            else:
+                writer.write(data)
+
+    # --- Requests ---
+
+    async def _submit(self, request):
+        user_id, lines = request.get('user_id'), request.get('lines')
+        if isinstance(user_id, bool) or not isinstance(user_id, int):
+            raise ValueError(f"user id {user_id!r} is not an integer")
+        if not isinstance(lines, list) or not lines:
+            raise ValueError("lines must be a non-empty list of [menu_item_id, quantity] pairs")
+        # Checked here so one bad submission is refused on its own instead of
+        # reaching the shared group commit.
+        for line in lines:
+            error = order_line_error(line)
+            if error:
+                raise ValueError(error)
+        lines = [tuple(line) for line in lines]
+        future = asyncio.get_running_loop().create_future()
+        await self._submissions.put(((user_id, lines), future))
+        order_id, shortages = await future
+        return {'order_id': order_id, 'shortages': shortages}
+
+    async def _menu(self, request):
+        def snapshot():
+            catalog = self.db.catalog
+            categories = catalog.get_categories()
+            items = [item for category in categories for item in catalog.get_items(category['id'])]
+            return {'categories': categories, 'items': items}
+        return await self._run(snapshot)
+
+    async def _stock(self, request):
+        def stock():
+            catalog = self.db.catalog
+            ids = request.get('items')
+            if ids is None:
+                catalog.get_categories()
+                items = [catalog.get_item(menu_item_id) for menu_item_id in list(catalog.items_by_id)]
+            else:
+                items = [catalog.get_item(int(menu_item_id)) for menu_item_id in ids]
+            return {'stock': {item['id']: item['quantity'] for item in items if item}}
+        return await self._run(stock)
+
+    HANDLERS = {
+        'submit': _submit,
+        'menu': _menu,
+        'stock': _stock,
+    }
+
+    # --- Group commit ---
+
+    async def _commit_loop(self):
+        while True:
+            batch = [await self._submissions.get()]
+            if self.batch_window:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self._submissions.empty():
+                batch.append(self._submissions.get_nowait())
+
+            orders = [order for order, _ in batch]
+            try:
+                results = await self._run(self.db.submit_orders_batch, orders)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats['orders'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+            changed = set()
+            for (order, future), (order_id, shortages) in zip(batch, results):
+                if not future.done():
+                    future.set_result((order_id, shortages))
+                if order_id:
+                    changed.update(menu_item_id for menu_item_id, _ in order[1])
+            if changed:
+                # A failed stock read only costs this push; the committer must keep running.
+                try:
+                    self.broadcast({'event': 'stock', 'stock': await self._stock_of(changed)})
+                except Exception as e:
+                    Logger.error(f"OrderHub: could not broadcast stock after commit: {e}")
+
+    async def _stock_of(self, menu_item_ids):
+        reply = await self._stock({'items': sorted(menu_item_ids)})
+        return reply['stock']
+
+    # --- Change notifications ---
+
+    def _read_data_version(self):
+        return self.db.pool.get().execute("PRAGMA data_version").fetchone()[0]
+
+    async def _watch_changes(self):
+        while True:
+            await asyncio.sleep(CHANGE_POLL_INTERVAL)
+            try:
+                version = await self._run(self._read_data_version)
+            except Exception as e:
+                Logger.error(f"OrderHub: change check failed: {e}")
+                continue
+            if version != self._data_version:
+                # Someone else committed: drop the cached menu and let terminals reload.
+                self._data_version = version
+                self.db.catalog.invalidate()
+                self.broadcast({'event': 'menu'})
+
+
+class OrderHubClient:
+    """Minimal asyncio client for the hub protocol.
+
+    ``on_event(message)`` is called for every pushed event.
+    """
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.reader = None
+        self.writer = None
+        self._next_id = 0
+        self._pending = {}
+        self._reader_task = None
+
+    async def connect(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self._reader_task = asyncio.create_task(self._read_loop())
+        return self
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            await self.writer.wait_closed()
+        if self._reader_task:
+            self._reader_task.cancel()
+
+    async def request(self, op, **fields):
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        self.writer.write(encode(dict(fields, id=self._next_id, op=op)))
+        await self.writer.drain()
+        reply = await future
+        reply.pop('id', None)
+        if not reply.pop('ok'):
+            raise RuntimeError(reply.get('error'))
+        return reply
+
+    async def submit_order(self, user_id, lines):
+        reply = await self.request('submit', user_id=user_id, lines=lines)
+        return reply['order_id'], reply['shortages']
+
+    async def get_menu(self):
+        return await self.request('menu')
+
+    async def get_stock(self, menu_item_ids=None):
+        reply = await self.request('stock', items=menu_item_ids)
+        return {int(menu_item_id): quantity for menu_item_id, quantity in reply['stock'].items()}
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                future = self._pending.pop(message.get('id'), None)
+                if future is not None:
+                    future.set_result(message)
+                elif 'event' in message and self.on_event:
+                    self.on_event(message)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("order hub connection closed"))
+            self._pending.clear()
+
+
+async def serve(db_name, host, port):
+    hub = await OrderHub(Database(db_name)).start(host, port)
+    try:
+        await hub.server.serve_forever()
+    finally:
+        await hub.close()
+        hub.db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='data/restaurant.db', help="database file (default: %(default)s)")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.db, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from kivy.logger import Logger
+
+JOURNAL_FOLDER = 'data/journal'
+# Start a new journal file once the current one would grow past this.
+MAX_JOURNAL_BYTES = 8 * 1024 * 1024
+
+# Record: magic, order id, payload length, CRC-32 of the payload, then the payload.
+RECORD_HEADER = struct.Struct('<4sQII')
+RECORD_MAGIC = b'RCPT'
+# Index slot for order N lives at N * INDEX_ENTRY.size: journal file number
+# (0 = no receipt), payload length and record offset.
+INDEX_ENTRY = struct.Struct('<IIQ')
+INDEX_NAME = 'receipts.idx'
+JOURNAL_NAME = re.compile(r'^receipts-(\d{6})\.jrnl$')
+
+
+def journal_name(number):
+    return f"receipts-{number:06d}.jrnl"
+
+
+class ReceiptJournal:
+    """Append-only journal of rendered receipts with an order-id index.
+
+    Each receipt is appended, length-prefixed and checksummed, to the
+    current ``receipts-NNNNNN.jrnl`` file in ``folder``; files rotate at
+    MAX_JOURNAL_BYTES. The index is direct-mapped: order N's
+    ``(file, length, offset)`` sits at a fixed position in ``receipts.idx``,
+    so ``read`` is one slot lookup plus one record read through mmap, with no
+    database query. A later receipt for the same order id replaces the slot.
+    ``verify`` and ``rebuild_index`` walk the journal files themselves.
+    """
+
+    def __init__(self, folder=JOURNAL_FOLDER, max_file_bytes=MAX_JOURNAL_BYTES):
+        self.folder = folder
+        self.max_file_bytes = max_file_bytes
+        self.index_path = os.path.join(folder, INDEX_NAME)
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        numbers = self.journal_numbers()
+        self._current = numbers[-1] if numbers else 1
+
+    def journal_numbers(self):
+        return sorted(int(match.group(1)) for match in map(JOURNAL_NAME.match, os.listdir(self.folder)) if match)
+
+    def _journal_path(self, number):
+        return os.path.join(self.folder, journal_name(number))
+
+    def append(self, order_id, payload):
+        """Append a receipt and point the index at it; returns ``(file number, offset)``."""
+        record = RECORD_HEADER.pack(RECORD_MAGIC, order_id, len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            path = self._journal_path(self._current)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size and size + len(record) > self.max_file_bytes:
+                self._current += 1
+                path = self._journal_path(self._current)
+            with open(path, 'ab') as f:
+                offset = f.tell()
+                f.write(record)
+            self._write_slot(order_id, self._current, len(payload), offset)
+        return self._current, offset
+
+    def _write_slot(self, order_id, number, length, offset):
+        mode = 'r+b' if os.path.exists(self.index_path) else 'w+b'
+        with open(self.index_path, mode) as f:
+            f.seek(order_id * INDEX_ENTRY.size)
+            f.write(INDEX_ENTRY.pack(number, length, offset))
+
+    def locate(self, order_id):
+        """``(file number, length, offset)`` for ``order_id``, or None."""
+        try:
+            with open(self.index_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                start = order_id * INDEX_ENTRY.size
+                if start + INDEX_ENTRY.size > len(index):
+                    return None
+                number, length, offset = INDEX_ENTRY.unpack_from(index, start)
+        except (OSError, ValueError):
+            # Missing or empty index.
+            return None
+        return (number, length, offset) if number else None
+
+    def read(self, order_id):
+        """The journaled receipt bytes for ``order_id``, or None if missing or damaged."""
+        location = self.locate(order_id)
+        if location is None:
+            return None
+        number, length, offset = location
+        try:
+            with open(self._journal_path(number), 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as journal:
+                end = offset + RECORD_HEADER.size + length
+                if end > len(journal):
+                    raise ValueError("record runs past the end of the file")
+                magic, record_order, record_length, crc = RECORD_HEADER.unpack_from(journal, offset)
+                payload = journal[offset + RECORD_HEADER.size:end]
+        except (OSError, ValueError) as e:
+            Logger.error(f"Journal: cannot read receipt for order #{order_id}: {e}")
+            return None
+        if magic != RECORD_MAGIC or record_order != order_id or record_length != length \
+                or zlib.crc32(payload) != crc:
+            Logger.error(f"Journal: receipt for order #{order_id} is damaged; run manage.py verify-journal")
+            return None
+        return payload
+
+    def iter_records(self, number):
+        """Yield ``(offset, order_id, length, error)`` for every record in one journal file.
+
+        ``error`` is None for a good record. Walking stops at the first record
+        whose header is unreadable, since nothing after it can be framed.
+        """
+        path = self._journal_path(number)
+        if not os.path.getsize(path):
+            return
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as journal:
+            offset = 0
+            size = len(journal)
+            while offset < size:
+                if offset + RECORD_HEADER.size > size:
+                    yield offset, None, None, "truncated record header"
+                    return
+                magic, order_id, length, crc = RECORD_HEADER.unpack_from(journal, offset)
+                if magic != RECORD_MAGIC:
+                    yield offset, None, None, "bad record marker"
+                    return
+                end = offset + RECORD_HEADER.size + length
+                if end > size:
+                    yield offset, order_id, length, "truncated receipt"
+                    return
+                if zlib.crc32(journal[offset + RECORD_HEADER.size:end]) != crc:
+                    yield offset, order_id, length, "checksum mismatch"
+                else:
+                    yield offset, order_id, length, None
+                offset = end
+
+    def verify(self):
+        """Check every record and index slot; returns ``(records checked, list of problems)``."""
+        problems = []
+        checked = 0
+        latest = {}
+        with self._lock:
+            for number in self.journal_numbers():
+                for offset, order_id, length, error in self.iter_records(number):
+                    checked += 1
+                    if error:
+                        problems.append(f"{journal_name(number)} @ {offset}: {error}")
+                    else:
+                        latest[order_id] = (number, length, offset)
+            for order_id, expected in latest.items():
+                found = self.locate(order_id)
+                if found != expected:
+                    problems.append(f"index entry for order #{order_id} is {found}, journal says {expected}")
+        return checked, problems
+
+    def rebuild_index(self):
+        """Rewrite the index from the journal files; returns the number of orders indexed."""
+        latest = {}
+        with self._lock:
+            for number in self.journal_numbers():
+                for offset, order_id, length, error in self.iter_records(number):
+                    if not error:
+                        latest[order_id] = (number, length, offset)
+            partial = self.index_path + '.part'
+            with open(partial, 'wb') as f:
+                for order_id in sorted(latest):
+                    f.seek(order_id * INDEX_ENTRY.size)
+                    f.write(INDEX_ENTRY.pack(*latest[order_id]))
+            os.replace(partial, self.index_path)
+        return len(latest)
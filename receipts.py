@@ -0,0 +1,338 @@
+"""Receipts: templates, ESC/POS and plain-text rendering, and a print spooler.
+
+Receipts are rendered off the UI thread and written to ``data/spool`` as one
+file per job. A single worker thread sends the jobs, oldest first, to the
+configured sink and deletes each one once it has been written, so jobs
+queued while the printer is off (or the app is closed) print later.
+
+settings.json keys: ``printer_enabled``, ``printer_sink`` (``file:<path>``
+for a file or a device such as /dev/usb/lp0, ``socket:<host>:<port>`` for
+a raw network printer) and ``printer_width`` in characters.
+
+Running this module starts a stand-in network printer that appends what it
+receives to a file, e.g. ``python receipts.py --port 9100 --out data/printer.prn``.
+"""
+import argparse
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import namedtuple
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from kivy.logger import Logger
+from receipt_journal import ReceiptJournal
+from utils import utc_to_local
+
+SPOOL_FOLDER = 'data/spool'
+DEFAULT_SINK = 'file:data/printer.prn'
+RECEIPT_WIDTH = 32
+# Seconds to wait before retrying after the sink fails, doubling up to the max.
+RETRY_DELAY = 2
+MAX_RETRY_DELAY = 60
+
+ESC = b'\x1b'
+GS = b'\x1d'
+INIT = ESC + b'@'
+ALIGN = {'left': ESC + b'a\x00', 'center': ESC + b'a\x01', 'right': ESC + b'a\x02'}
+BOLD = {False: ESC + b'E\x00', True: ESC + b'E\x01'}
+DOUBLE = {False: GS + b'!\x00', True: GS + b'!\x11'}
+FEED_AND_CUT = GS + b'V\x42\x03'
+
+# One entry per template line: (kind, styles, format string). Kinds are
+# 'text', 'rule', 'items' (one row per order line), 'total' and 'cut';
+# styles are any of center/right, bold and double.
+RECEIPT_TEMPLATE = (
+    ('text', 'center bold double', '{company_name}'),
+    ('text', 'center', 'Order #{order_id}'),
+    ('text', 'center', '{date}'),
+    ('text', 'center', 'Cashier: {cashier}'),
+    ('rule', '', ''),
+    ('items', '', '{quantity} x {name}'),
+    ('rule', '', ''),
+    ('total', 'bold', 'TOTAL'),
+    ('text', 'center', 'Thank you!'),
+    ('cut', '', ''),
+)
+
+CompiledLine = namedtuple('CompiledLine', 'kind align bold double format')
+
+
+def compile_template(template):
+    """Parse a template once into lines with their style and a bound formatter."""
+    compiled = []
+    for kind, styles, pattern in template:
+        styles = styles.split()
+        align = 'center' if 'center' in styles else 'right' if 'right' in styles else 'left'
+        compiled.append(CompiledLine(kind, align, 'bold' in styles, 'double' in styles, pattern.format_map))
+    return tuple(compiled)
+
+
+def receipt_context(order, company_name=''):
+    """Turn a Database.get_order result into the values the template uses."""
+    try:
+        date = utc_to_local(order['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        date = str(order['created_at'] or '')
+    return {
+        'company_name': company_name,
+        'order_id': order['id'],
+        'date': date,
+        'cashier': order['user_name'],
+        'items': order['items'],
+        'total': order['total'],
+    }
+
+
+def _columns(left, right, width):
+    """``left`` and ``right`` on one line, truncating ``left`` if they don't fit."""
+    room = max(width - len(right) - 1, 0)
+    return f"{left[:room]:<{room}} {right}"
+
+
+class ReceiptRenderer:
+    """Lays a receipt out from a compiled template as ESC/POS bytes or plain text."""
+
+    def __init__(self, template=RECEIPT_TEMPLATE, width=RECEIPT_WIDTH, encoding='cp437'):
+        self.lines = compile_template(template)
+        self.width = width
+        self.encoding = encoding
+
+    def _layout(self, receipt):
+        """Yield ``(line, text)`` pairs; ``text`` is None for a cut."""
+        for line in self.lines:
+            width = self.width // 2 if line.double else self.width
+            if line.kind == 'text':
+                yield line, line.format(receipt)[:width]
+            elif line.kind == 'rule':
+                yield line, '-' * width
+            elif line.kind == 'items':
+                for item in receipt['items']:
+                    yield line, _columns(line.format(item), f"${item['price'] * item['quantity']:.2f}", width)
+            elif line.kind == 'total':
+                yield line, _columns(line.format(receipt), f"${receipt['total']:.2f}", width)
+            elif line.kind == 'cut':
+                yield line, None
+
+    def render_text(self, receipt):
+        out = []
+        for line, text in self._layout(receipt):
+            if text is None:
+                continue
+            if line.align == 'center':
+                text = text.center(self.width).rstrip()
+            elif line.align == 'right':
+                text = text.rjust(self.width)
+            out.append(text)
+        return "\n".join(out) + "\n"
+
+    def render_escpos(self, receipt):
+        out = [INIT]
+        for line, text in self._layout(receipt):
+            if text is None:
+                out.append(FEED_AND_CUT)
+                continue
+            out.append(ALIGN[line.align] + BOLD[line.bold] + DOUBLE[line.double])
+            out.append(text.encode(self.encoding, errors='replace') + b'\n')
+        out.append(ALIGN['left'] + BOLD[False] + DOUBLE[False])
+        return b''.join(out)
+
+
+class FileSink:
+    """Appends jobs to a file, or writes them to a printer device such as /dev/usb/lp0."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, data):
+        with open(self.path, 'ab') as f:
+            f.write(data)
+
+    def __repr__(self):
+        return f"FileSink({self.path!r})"
+
+
+class SocketSink:
+    """Sends each job over its own TCP connection, like a raw port-9100 printer."""
+
+    def __init__(self, host, port, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def write(self, data):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as conn:
+            conn.sendall(data)
+
+    def __repr__(self):
+        return f"SocketSink({self.host!r}, {self.port})"
+
+
+def make_sink(spec):
+    """Build a sink from a ``printer_sink`` setting; a bare path means a file."""
+    if spec.startswith('socket:'):
+        host, _, port = spec[len('socket:'):].rpartition(':')
+        return SocketSink(host or '127.0.0.1', int(port))
+    if spec.startswith('file:'):
+        spec = spec[len('file:'):]
+    return FileSink(spec)
+
+
+class PrintSpooler:
+    """Persistent print queue drained by one background thread.
+
+    ``submit`` writes the job to ``folder`` (under a temporary name, then
+    renamed) and returns at once. Job names start with a nanosecond
+    timestamp so the worker, and a restarted app, send them in order. A job
+    is deleted only after the sink accepted it; on failure the worker backs
+    off and tries the same job again.
+    """
+
+    def __init__(self, folder, sink):
+        self.folder = folder
+        self.sink = sink
+        self._wake = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        os.makedirs(folder, exist_ok=True)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='print-spooler', daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, data, name='receipt'):
+        path = os.path.join(self.folder, f"{time.time_ns():020d}-{name}.job")
+        partial = path + '.part'
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+        with self._wake:
+            self._wake.notify()
+        return path
+
+    def pending(self):
+        return sorted(name for name in os.listdir(self.folder) if name.endswith('.job'))
+
+    def stop(self, timeout=5.0):
+        with self._wake:
+            self._stopping = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        delay = RETRY_DELAY
+        while True:
+            with self._wake:
+                while not self._stopping and not self.pending():
+                    self._wake.wait()
+                if self._stopping:
+                    return
+            name = self.pending()[0]
+            path = os.path.join(self.folder, name)
+            try:
+                with open(path, 'rb') as f:
+                    self.sink.write(f.read())
+                os.remove(path)
+                delay = RETRY_DELAY
+            except OSError as e:
+                Logger.error(f"Receipts: printing {name} to {self.sink!r} failed, retrying in {delay}s: {e}")
+                with self._wake:
+                    self._wake.wait_for(lambda: self._stopping, timeout=delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+
+class ReceiptPrinter:
+    """What the app uses: renders order receipts and queues them for printing.
+
+    ``print_order`` returns immediately; the order is read and rendered on
+    the database executor, the ESC/POS bytes are appended to the receipt
+    journal and the spooler does the printing. ``reprint`` sends the
+    journaled bytes again without touching the database. With
+    ``printer_enabled`` off receipts are still journaled, but nothing is
+    spooled and the text receipt is only logged.
+    """
+
+    def __init__(self, db, settings, spool_folder=SPOOL_FOLDER, journal=None):
+        self.db = db
+        self.journal = journal if journal is not None else ReceiptJournal()
+        self.enabled = bool(settings.get('printer_enabled', False))
+        self.company_name = settings.get('company_name', '')
+        self.renderer = ReceiptRenderer(width=int(settings.get('printer_width', RECEIPT_WIDTH)))
+        self.spooler = None
+        if self.enabled:
+            sink = make_sink(settings.get('printer_sink', DEFAULT_SINK))
+            self.spooler = PrintSpooler(spool_folder, sink).start()
+
+    def print_order(self, order_id):
+        return self.db.executor.submit(self._spool_order, order_id)
+
+    def _spool_order(self, order_id):
+        order = self.db.get_order(order_id)
+        if order is None:
+            Logger.error(f"Receipts: order #{order_id} not found")
+            return None
+        receipt = receipt_context(order, self.company_name)
+        data = self.renderer.render_escpos(receipt)
+        self.journal.append(order_id, data)
+        if self.spooler is None:
+            Logger.info(f"Receipts: printer disabled, receipt for order #{order_id}:\n"
+                        f"{self.renderer.render_text(receipt)}")
+            return None
+        return self.spooler.submit(data, f"order-{order_id}")
+
+    def reprint(self, order_id):
+        """Queue the journaled receipt again; falls back to re-rendering if it isn't journaled."""
+        data = self.journal.read(order_id)
+        if data is None:
+            return self.print_order(order_id)
+        if self.spooler is None:
+            Logger.info(f"Receipts: printer disabled, not reprinting order #{order_id}")
+            return None
+        return self.spooler.submit(data, f"reprint-{order_id}")
+
+    def stop(self):
+        if self.spooler is not None:
+            self.spooler.stop()
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        data = self.rfile.read()
+        with self.server.lock, open(self.server.out_path, 'ab') as f:
+            f.write(data)
+        Logger.info(f"Stand-in printer: received {len(data)} bytes from {self.client_address[0]}")
+
+
+class StandInPrinter(socketserver.ThreadingTCPServer):
+    """A local stand-in for a network receipt printer: appends each job to a file."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, out_path, host='127.0.0.1', port=9100):
+        super().__init__((host, port), _StandInHandler)
+        self.out_path = out_path
+        self.lock = threading.Lock()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in receipt printer")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=9100, help="port to listen on (default: %(default)s)")
+    parser.add_argument('--out', default='data/printer.prn', help="file to append jobs to (default: %(default)s)")
+    args = parser.parse_args(argv)
+    with StandInPrinter(args.out, args.host, args.port) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import importlib
+import os
+import time
+from kivy.lang import Builder
+from kivy.logger import Logger
+from kivy.uix.screenmanager import ScreenManager
+
+KV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kv')
+
+
+class LazyScreenManager(ScreenManager):
+    """ScreenManager that builds registered screens the first time they are shown.
+
+    ``register`` records how to make a screen: its class (or a
+    ``'module:Class'`` path, imported on demand) and the kv file under
+    ``kv/`` holding its rules. Nothing is imported, parsed or instantiated
+    until the screen is navigated to or looked up with ``get_screen``.
+    """
+
+    def __init__(self, timeline=None, **kwargs):
+        super().__init__(**kwargs)
+        self.timeline = timeline
+        self._registry = {}
+        self._loaded_kv = set()
+
+    def register(self, name, screen_class, kv_file=None, **kwargs):
+        self._registry[name] = (screen_class, kv_file, kwargs)
+
+    def is_built(self, name):
+        return super().has_screen(name)
+
+    def has_screen(self, name):
+        return name in self._registry or super().has_screen(name)
+
+    def get_screen(self, name):
+        if name in self._registry and not super().has_screen(name):
+            self.build_screen(name)
+        return super().get_screen(name)
+
+    def build_screen(self, name):
+        screen_class, kv_file, kwargs = self._registry[name]
+        started = time.perf_counter()
+        if isinstance(screen_class, str):
+            module_name, class_name = screen_class.split(':')
+            screen_class = getattr(importlib.import_module(module_name), class_name)
+        if kv_file and kv_file not in self._loaded_kv:
+            Builder.load_file(os.path.join(KV_DIR, kv_file))
+            self._loaded_kv.add(kv_file)
+        screen = screen_class(name=name, **kwargs)
+        self.add_widget(screen)
+        elapsed = (time.perf_counter() - started) * 1000
+        if self.timeline is not None:
+            self.timeline.mark(f"built screen '{name}'")
+        Logger.debug(f"Screens: built '{name}' in {elapsed:.1f} ms")
+        return screen
+
+
+class StartupTimeline:
+    """Records how long each startup phase took, relative to process start."""
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.phases = []
+        self._finished = False
+
+    def mark(self, phase):
+        if not self._finished:
+            self.phases.append((phase, time.perf_counter() - self.start))
+
+    def finish(self, phase):
+        """Record the final phase and log the whole timeline once."""
+        if self._finished:
+            return
+        self.mark(phase)
+        self._finished = True
+        previous = 0.0
+        for name, at in self.phases:
+            Logger.info(f"Startup: {at * 1000:8.1f} ms (+{(at - previous) * 1000:6.1f}) {name}")
+            previous = at
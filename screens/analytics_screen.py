@@ -0,0 +1,100 @@
+from kivy.uix.screenmanager import Screen
+from kivy.uix.label import Label
+from kivy.properties import ListProperty, StringProperty
+from kivy.metrics import sp
+from kivy.app import App
+from restaurant_pos import events
+from restaurant_pos.analytics import DAY_NAMES, sales_report
+from restaurant_pos.db_executor import LoadingMixin
+
+# Spinner label -> days of history (None for everything).
+ANALYTICS_PERIODS = {'Last 7 Days': 7, 'Last 30 Days': 30, 'Last 365 Days': 365, 'All Time': None}
+HEAT_EMPTY = (1, 1, 1, 1)
+HEAT_FULL = (0.85, 0.3, 0.1, 1)
+
+
+class HeatCell(Label):
+    background = ListProperty(HEAT_EMPTY)
+
+
+class AnalyticsScreen(LoadingMixin, Screen):
+    period = StringProperty('Last 30 Days')
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._dirty = True
+        self._heat_cells = []
+        App.get_running_app().db.events.subscribe((events.ORDER_CREATED, events.ORDERS_CLEARED),
+                                                  self._on_orders_changed)
+
+    def on_pre_enter(self):
+        if not self._heat_cells:
+            self._build_heatmap()
+        if self._dirty:
+            self.refresh()
+
+    def on_period(self, instance, value):
+        if self._heat_cells:
+            self.refresh()
+
+    def _on_orders_changed(self, changes):
+        if self.manager is not None and self.manager.current == self.name:
+            self.refresh()
+        else:
+            self._dirty = True
+
+    def refresh(self):
+        self._dirty = False
+        self.ids.analytics_status.text = "Crunching numbers..."
+        # Keyed so switching periods quickly only shows the last one asked for.
+        self.run_db(sales_report, App.get_running_app().db, ANALYTICS_PERIODS[self.period],
+                    on_done=self._show_report, on_error=self._show_error, key='report')
+
+    def _show_error(self, error):
+        self.ids.analytics_status.text = f"Error building reports: {error}"
+
+    def _build_heatmap(self):
+        # One header row of hours and one row per weekday; cells are recoloured on refresh.
+        grid = self.ids.heatmap_grid
+        grid.add_widget(Label(text='', color=(0, 0, 0, 1), font_size=sp(11)))
+        for hour in range(24):
+            grid.add_widget(Label(text=f"{hour:02d}", color=(0, 0, 0, 1), font_size=sp(11)))
+        for day in DAY_NAMES:
+            grid.add_widget(Label(text=day, color=(0, 0, 0, 1), font_size=sp(11)))
+            row = []
+            for hour in range(24):
+                cell = HeatCell()
+                grid.add_widget(cell)
+                row.append(cell)
+            self._heat_cells.append(row)
+
+    def _show_report(self, report):
+        summary = report['summary']
+        self.ids.analytics_status.text = (
+            f"Built in {report['load_ms'] + report['compute_ms']:.0f} ms" if summary['orders']
+            else "No orders in this period."
+        )
+        self.ids.summary_label.text = (
+            f"Orders: {summary['orders']}    Revenue: ${summary['revenue']:.2f}    "
+            f"Avg ticket: ${summary['average']:.2f}    Median: ${summary['median']:.2f}    "
+            f"Items/order: {summary['items_per_order']:.1f}"
+        )
+        self.ids.top_sellers_label.text = "\n".join(
+            f"{rank}. {item['name']} ({item['category'] or 'no category'}) - "
+            f"{item['quantity']} sold, ${item['revenue']:.2f}"
+            for rank, item in enumerate(report['top_sellers'], 1)
+        ) or "Nothing sold yet."
+        self.ids.pairs_label.text = "\n".join(
+            f"{pair['a']} + {pair['b']}: {pair['orders']} orders "
+            f"({pair['confidence'] * 100:.0f}% of {pair['a']} orders)"
+            for pair in report['co_occurrence']
+        ) or "No items sold together yet."
+
+        heatmap = report['heatmap']
+        peak = heatmap.max() or 1
+        for day, row in enumerate(self._heat_cells):
+            for hour, cell in enumerate(row):
+                count = int(heatmap[day, hour])
+                level = count / peak
+                cell.text = str(count) if count else ''
+                cell.background = [empty + (full - empty) * level for empty, full in zip(HEAT_EMPTY, HEAT_FULL)]
@@ -7,11 +7,11 @@ from kivy.uix.textinput import TextInput
 from kivy.uix.spinner import Spinner
 from kivy.app import App
 from restaurant_pos.database import Database
-from restaurant_pos.utils import hash_password
+from restaurant_pos.db_executor import LoadingMixin
 
 
 
-class CreateAccountScreen(Screen):
+class CreateAccountScreen(LoadingMixin, Screen):
     def __init__(self, db=None, **kwargs):
         super().__init__(**kwargs)
         self.db = db  # ✅ Use the shared database instance
@@ -41,12 +41,18 @@ class CreateAccountScreen(Screen):
             self.show_popup("Error", "Passwords do not match.")
             return
 
-        if self.db.get_user_by_username(username):
+        if self.loading:
+            return
+
+        # Hashing is deliberately slow, so it runs on a database worker.
+        self.run_db(self.db.auth.create_user, username, password, role, on_done=lambda created: self._on_created(created, role),
+                    on_error=lambda e: self.show_popup("Error", f"Could not create account: {e}"))
+
+    def _on_created(self, created, role):
+        if not created:
             self.show_popup("Error", "Username already exists.")
             return
 
-        password_hash = hash_password(password)
-        self.db.create_user(username, password_hash, role)
         self.show_popup("Success", f"{role.capitalize()} account created.")
 
         self.ids.username_input.text = ""
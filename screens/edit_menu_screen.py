@@ -7,9 +7,11 @@ from kivy.uix.popup import Popup
 from kivy.properties import NumericProperty
 from kivy.metrics import dp
 from kivy.app import App
+from restaurant_pos import events
+from restaurant_pos.widget_pool import PoolButton, WidgetPool
 
 
-class CategoryButton(Button):
+class CategoryButton(PoolButton):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.background_normal = ''
@@ -27,62 +29,106 @@ class MenuItemBox(BoxLayout):
         self.height = dp(50)
         self.spacing = dp(5)
 
-
-class EditMenuScreen(Screen):
-    current_category = NumericProperty(None, allownone=True)
-
-    def on_enter(self):
-        self.load_categories()
-
-    def load_categories(self):
-        self.ids.categories_container.clear_widgets()
-        categories = App.get_running_app().db.get_categories()
-        for cat in categories:
-            btn = CategoryButton(
-                text=cat['name'],
-                on_press=lambda x, cat=cat: self.show_category_items(cat)
-            )
-            self.ids.categories_container.add_widget(btn)
-
-    def show_category_items(self, category):
-        self.current_category = category['id']
-        self.ids.current_category_label.text = category['name']
-        self.ids.items_container.clear_widgets()
-        items = App.get_running_app().db.get_menu_items_by_category(category['id'])
-        for item in items:
-            self.add_item_to_layout(item)
-
-    def add_item_to_layout(self, item):
-        box = MenuItemBox()
-
-        name_input = TextInput(
-            text=item.get('name', 'Unnamed'),
+        self.name_input = TextInput(
             size_hint_x=0.5,
             font_size=dp(18),
             readonly=True,
             background_color=(0.9, 0.9, 0.9, 1)
         )
-
-        price_input = TextInput(
-            text=f"{item['price']:.2f}",
+        self.price_input = TextInput(
             size_hint_x=0.3,
             font_size=dp(18),
             input_filter='float',
             readonly=True,
             background_color=(1, 1, 1, 1)
         )
-
-        del_btn = Button(
+        self.delete_button = PoolButton(
             text='Delete',
             size_hint_x=0.2,
-            background_color=(0.8, 0.2, 0.2, 1),
-            on_press=lambda x, i=item: self.delete_item(i['id'])
+            background_color=(0.8, 0.2, 0.2, 1)
         )
+        self.add_widget(self.name_input)
+        self.add_widget(self.price_input)
+        self.add_widget(self.delete_button)
+
+
+class EditMenuScreen(Screen):
+    current_category = NumericProperty(None, allownone=True)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._loaded = False
+        self._category_buttons = {}
+        self._item_rows = {}
+        self._category_pool = WidgetPool(CategoryButton)
+        self._item_pool = WidgetPool(MenuItemBox)
+        App.get_running_app().db.events.subscribe(events.MENU_EVENTS, self._on_menu_changed)
+
+    def on_enter(self):
+        if not self._loaded:
+            self.load_categories()
+
+    def load_categories(self):
+        self._loaded = True
+        categories = App.get_running_app().db.get_categories()
+        buttons = self._category_pool.fill(self.ids.categories_container, categories, self.bind_category_button)
+        self._category_buttons = {cat['id']: btn for cat, btn in zip(categories, buttons)}
+
+    def bind_category_button(self, btn, category):
+        btn.text = category['name']
+        btn.callback = lambda cat=category: self.show_category_items(cat)
+
+    def add_category_button(self, category):
+        container = self.ids.categories_container
+        btn = self._category_pool.acquire()
+        self.bind_category_button(btn, category)
+        # Keep the list sorted by name; Kivy lays children out last-to-first.
+        position = sum(1 for other in self._category_buttons.values() if other.text <= category['name'])
+        container.add_widget(btn, index=len(container.children) - position)
+        self._category_buttons[category['id']] = btn
 
-        box.add_widget(name_input)
-        box.add_widget(price_input)
-        box.add_widget(del_btn)
+    def show_category_items(self, category):
+        self.current_category = category['id']
+        self.ids.current_category_label.text = category['name']
+        items = App.get_running_app().db.get_menu_items_by_category(category['id'])
+        rows = self._item_pool.fill(self.ids.items_container, items, self.bind_item_row)
+        self._item_rows = {item['id']: row for item, row in zip(items, rows)}
+
+    def _on_menu_changed(self, changes):
+        if not self._loaded:
+            return
+        for change in changes:
+            data = change.data
+            if change.type == events.CATEGORY_ADDED:
+                self.add_category_button(data)
+            elif change.type == events.CATEGORY_DELETED:
+                btn = self._category_buttons.pop(data['id'], None)
+                if btn is not None:
+                    self._category_pool.release(btn)
+                if data['id'] == self.current_category:
+                    self.current_category = None
+                    self.ids.current_category_label.text = ''
+                    for row in self._item_rows.values():
+                        self._item_pool.release(row)
+                    self._item_rows = {}
+            elif change.type == events.MENU_ITEM_ADDED:
+                if data['category_id'] == self.current_category and data['id'] not in self._item_rows:
+                    self.add_item_to_layout(data)
+            elif change.type == events.MENU_ITEM_DELETED:
+                row = self._item_rows.pop(data['id'], None)
+                if row is not None:
+                    self._item_pool.release(row)
+
+    def add_item_to_layout(self, item):
+        box = self._item_pool.acquire()
+        self.bind_item_row(box, item)
         self.ids.items_container.add_widget(box)
+        self._item_rows[item['id']] = box
+
+    def bind_item_row(self, box, item):
+        box.name_input.text = item.get('name', 'Unnamed')
+        box.price_input.text = f"{item['price']:.2f}"
+        box.delete_button.callback = lambda i=item: self.delete_item(i['id'])
 
     def show_add_category_popup(self):
         content = BoxLayout(orientation='vertical', spacing=dp(10))
@@ -98,12 +144,37 @@ class EditMenuScreen(Screen):
         popup.content = content
         popup.open()
 
+    def show_station_popup(self):
+        if not self.current_category:
+            return
+        db = App.get_running_app().db
+        current = next((cat['station'] for cat in db.get_categories() if cat['id'] == self.current_category), '')
+
+        content = BoxLayout(orientation='vertical', spacing=dp(10))
+        content.add_widget(Label(text=f"Kitchen station for '{self.ids.current_category_label.text}'",
+                                 size_hint_y=None, height=dp(30)))
+        station_input = TextInput(text=current, hint_text='e.g. kitchen, bar, grill', multiline=False,
+                                  size_hint_y=None, height=dp(50))
+        content.add_widget(station_input)
+
+        popup = Popup(title='Set Station', size_hint=(0.6, 0.4))
+
+        def on_save(_):
+            db.set_category_station(self.current_category, station_input.text.strip().lower())
+            popup.dismiss()
+
+        btn_layout = BoxLayout(size_hint_y=None, height=dp(50))
+        btn_layout.add_widget(Button(text='Cancel', on_press=popup.dismiss))
+        btn_layout.add_widget(Button(text='Save', on_press=on_save))
+        content.add_widget(btn_layout)
+
+        popup.content = content
+        popup.open()
+
     def add_category(self, name):
         if not name:
             return
-        db = App.get_running_app().db
-        if db.add_category(name):
-            self.load_categories()
+        App.get_running_app().db.add_category(name)
 
     def show_add_item_popup(self):
         if not self.current_category:
@@ -151,33 +222,17 @@ class EditMenuScreen(Screen):
         success = db.add_menu_item( price, self.current_category, name)
         if success:
             print("Menu item added.")
-            category = {'id': self.current_category, 'name': self.ids.current_category_label.text}
-            self.show_category_items(category)
         else:
             print("Failed to add menu item.")
 
     def delete_item(self, item_id):
-        db = App.get_running_app().db
-        if db.delete_menu_item(item_id):
-            category = {'id': self.current_category, 'name': self.ids.current_category_label.text}
-            self.show_category_items(category)
+        App.get_running_app().db.delete_menu_item(item_id)
 
     def delete_current_category(self):
         if not self.current_category:
             return
 
         db = App.get_running_app().db
-        # Call the delete_category method, which will handle both category and its items
+        # Call the delete_category method, which will handle both category and its items.
+        # The CATEGORY_DELETED event clears this screen and tells the order screen to rebuild.
         db.delete_category(self.current_category)
-
-        # Reset current category and UI elements
-        self.current_category = None
-        self.ids.current_category_label.text = ''
-        self.ids.items_container.clear_widgets()
-
-        # Reload categories after deletion
-        self.load_categories()
-
-        # Refresh the order screen if needed
-        order_screen = self.manager.get_screen('order_screen')
-        order_screen.refresh_categories()
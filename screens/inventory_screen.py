@@ -5,12 +5,39 @@ from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.popup import Popup
 from kivy.uix.textinput import TextInput
-from kivy.metrics import dp, sp
+from kivy.metrics import sp
+from kivy.properties import BooleanProperty, NumericProperty, ObjectProperty, StringProperty
+from restaurant_pos import events
+
+LOW_STOCK_THRESHOLD = 5
+# Sort choices for the list; each maps a (name, quantity) pair to a sort key.
+INVENTORY_SORTS = {
+    'Name': lambda entry: entry[0].lower(),
+    'Low stock first': lambda entry: (entry[1], entry[0].lower()),
+    'Most stock first': lambda entry: (-entry[1], entry[0].lower()),
+}
+
+
+class InventoryRow(BoxLayout):
+    """RecycleView row for one inventory item."""
+    item_name = StringProperty("")
+    quantity = NumericProperty(0)
+    low = BooleanProperty(False)
+    screen = ObjectProperty(None, allownone=True)
 
 
 class InventoryScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self._loaded = False
+        # The model: every inventory item by name. The RecycleView shows the
+        # filtered, sorted subset in self._shown, with row positions in self._positions.
+        self._quantities = {}
+        self._shown = []
+        self._positions = {}
+        bus = App.get_running_app().db.events
+        bus.subscribe(events.INVENTORY_CHANGED, self._on_inventory_changed)
+        bus.subscribe(events.STOCK_CHANGED, self._on_stock_changed)
 
     def submit_inventory_item(self):
         name = self.ids.item_name_input.text.strip()
@@ -22,30 +49,67 @@ class InventoryScreen(Screen):
             app.db.add_or_update_inventory_item(name, quantity)
             self.ids.item_name_input.text = ''
             self.ids.item_quantity_input.text = ''
-            self.update_inventory_display()
         except ValueError:
             print("Invalid quantity entered.")
 
     def update_inventory_display(self):
-        container = self.ids.inventory_list
-        container.clear_widgets()
-
-        app = App.get_running_app()
-        items = app.db.get_inventory_items()
-
-        for item in items:
-            name = item['name']
-            quantity = item['quantity']
-
-            row = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(10))
-            row.add_widget(Label(text=name, size_hint_x=0.5, color=(0, 0, 0, 1), font_size=sp(18)))
-            row.add_widget(Label(text=str(quantity), size_hint_x=0.2, color=(0, 0, 0, 1), font_size=sp(18)))
-
-            edit_button = Button(text="Edit", size_hint_x=0.3, font_size=sp(16))
-            edit_button.bind(on_press=lambda btn, n=name, q=quantity: self.open_edit_popup(n, q))
-            row.add_widget(edit_button)
-
-            container.add_widget(row)
+        """Reload the model from the database and redraw the list."""
+        self._loaded = True
+        items = App.get_running_app().db.get_inventory_items()
+        self._quantities = {item['name']: item['quantity'] for item in items}
+        self.apply_view()
+
+    def apply_view(self, *args):
+        """Re-filter and re-sort the in-memory model; no database access."""
+        prefix = self.ids.inventory_filter.text.strip().lower()
+        sort_key = INVENTORY_SORTS.get(self.ids.inventory_sort.text, INVENTORY_SORTS['Name'])
+        entries = sorted(((name, quantity) for name, quantity in self._quantities.items()
+                          if name.lower().startswith(prefix)), key=sort_key)
+        self._shown = [name for name, _ in entries]
+        self._positions = {name: index for index, name in enumerate(self._shown)}
+        self.ids.inventory_view.data = [self._row_data(name, quantity) for name, quantity in entries]
+
+    def _row_data(self, name, quantity):
+        return {
+            'item_name': name,
+            'quantity': quantity,
+            'low': quantity <= LOW_STOCK_THRESHOLD,
+            'screen': self
+        }
+
+    def set_inventory_row(self, name, quantity):
+        """Add, update or (for ``quantity`` None) remove the item ``name``.
+
+        A quantity change rewrites just that row in place, even if the current
+        sort would now put it elsewhere, so the list does not jump under the
+        user's finger. Adds and removes re-run the filter and sort.
+        """
+        if quantity is None:
+            if self._quantities.pop(name, None) is not None or name in self._positions:
+                self.apply_view()
+        elif name in self._quantities:
+            self._quantities[name] = quantity
+            index = self._positions.get(name)
+            if index is not None:
+                self.ids.inventory_view.data[index] = self._row_data(name, quantity)
+        else:
+            self._quantities[name] = quantity
+            self.apply_view()
+
+    def _on_inventory_changed(self, changes):
+        if not self._loaded:
+            return
+        for change in changes:
+            self.set_inventory_row(change.data['name'], change.data['quantity'])
+
+    def _on_stock_changed(self, changes):
+        # Orders only say which menu items moved, so re-read the quantities
+        # (one query) and patch the labels that changed.
+        if not self._loaded:
+            return
+        for item in App.get_running_app().db.get_inventory_items():
+            if self._quantities.get(item['name']) != item['quantity']:
+                self.set_inventory_row(item['name'], item['quantity'])
 
     def open_edit_popup(self, item_name, current_quantity):
         layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
@@ -73,14 +137,12 @@ class InventoryScreen(Screen):
                 new_qty = int(qty_input.text)
                 App.get_running_app().db.set_inventory_quantity(item_name, new_qty)
                 popup.dismiss()
-                self.update_inventory_display()
             except ValueError:
                 print("Invalid quantity")
 
         def delete_item(instance):
             App.get_running_app().db.delete_inventory_item(item_name)
             popup.dismiss()
-            self.update_inventory_display()
 
         save_btn.bind(on_press=save_changes)
         delete_btn.bind(on_press=delete_item)
@@ -88,4 +150,5 @@ class InventoryScreen(Screen):
         popup.open()
 
     def on_pre_enter(self):
-        self.update_inventory_display()
+        if not self._loaded:
+            self.update_inventory_display()
@@ -0,0 +1,145 @@
+from kivy.uix.screenmanager import Screen
+from kivy.uix.boxlayout import BoxLayout
+from kivy.properties import ListProperty, NumericProperty, ObjectProperty, StringProperty
+from kivy.metrics import dp
+from kivy.app import App
+from kivy.clock import Clock
+from restaurant_pos import events
+
+ALL_STATIONS = 'All'
+# Orders written by other terminals or the order hub never reach this
+# process's EventBus, so the change log is checked this often (seconds).
+CHANGE_POLL_INTERVAL = 2
+# More order changes than this in one check reloads every ticket instead.
+CHANGE_POLL_LIMIT = 500
+# Button label for moving a ticket on from each status.
+NEXT_ACTION = {'open': 'Start', 'preparing': 'Ready', 'ready': 'Served', 'served': 'Close'}
+STATUS_COLORS = {
+    'open': (0.85, 0.85, 0.85, 1),
+    'preparing': (1, 0.85, 0.5, 1),
+    'ready': (0.6, 0.9, 0.6, 1),
+    'served': (0.7, 0.8, 1, 1),
+}
+
+
+class KitchenTicket(BoxLayout):
+    order_id = NumericProperty(0)
+    header = StringProperty("")
+    lines = StringProperty("")
+    line_count = NumericProperty(0)
+    status = StringProperty("open")
+    action = StringProperty("")
+    background = ListProperty(STATUS_COLORS['open'])
+    screen = ObjectProperty(None, allownone=True)
+
+    def update(self, ticket):
+        self.order_id = ticket['id']
+        self.header = f"[b]#{ticket['id']}[/b]  {ticket['time']}  {ticket['username']}"
+        self.lines = "\n".join(f"{item['quantity']} x {item['name']}" for item in ticket['items'])
+        self.line_count = len(ticket['items'])
+        self.status = ticket['status']
+        self.action = NEXT_ACTION.get(ticket['status'], '')
+        self.background = STATUS_COLORS.get(ticket['status'], STATUS_COLORS['open'])
+        # header + lines + status button, plus padding and spacing
+        self.height = dp(30) + dp(24) * self.line_count + dp(44) + dp(30)
+
+
+class KitchenScreen(Screen):
+    station = StringProperty(ALL_STATIONS)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._tickets = {}
+        self._loaded = False
+        self._seq = 0
+        self._poll = None
+        App.get_running_app().db.events.subscribe(
+            (events.ORDER_CREATED, events.ORDER_STATUS_CHANGED, events.ORDERS_CLEARED),
+            self._on_orders_changed
+        )
+
+    def on_pre_enter(self):
+        db = App.get_running_app().db
+        self.ids.station_spinner.values = [ALL_STATIONS] + db.get_stations()
+        if not self._loaded:
+            self.load_tickets()
+        else:
+            self.poll_changes()
+
+    def on_enter(self):
+        self._poll = Clock.schedule_interval(self.poll_changes, CHANGE_POLL_INTERVAL)
+
+    def on_leave(self):
+        if self._poll is not None:
+            self._poll.cancel()
+            self._poll = None
+
+    def on_station(self, instance, value):
+        if self._loaded:
+            self.load_tickets()
+
+    def _station_filter(self):
+        return None if self.station == ALL_STATIONS else self.station
+
+    def load_tickets(self):
+        db = App.get_running_app().db
+        self._loaded = True
+        # Taken before reading, so a change made in between is picked up by the next poll.
+        self._seq = db.latest_change_seq()
+        self.ids.tickets_container.clear_widgets()
+        self._tickets = {}
+        for ticket in db.get_active_orders(self._station_filter()):
+            self.set_ticket(ticket)
+        self._update_status()
+
+    def set_ticket(self, ticket):
+        widget = self._tickets.get(ticket['id'])
+        if widget is None:
+            widget = KitchenTicket(screen=self)
+            self._tickets[ticket['id']] = widget
+            self.ids.tickets_container.add_widget(widget)
+        widget.update(ticket)
+
+    def remove_ticket(self, order_id):
+        widget = self._tickets.pop(order_id, None)
+        if widget is not None:
+            self.ids.tickets_container.remove_widget(widget)
+
+    def _on_orders_changed(self, changes):
+        if not self._loaded:
+            return
+        if any(change.type == events.ORDERS_CLEARED for change in changes):
+            self.load_tickets()
+            return
+        # Events arrive after the commit, so the change log already holds
+        # these orders; reading it also moves _seq past them, and the next
+        # poll does not fetch the same tickets again.
+        self.poll_changes()
+
+    def poll_changes(self, *args):
+        changes = App.get_running_app().db.changes_since(self._seq, CHANGE_POLL_LIMIT, tables=('orders',))
+        if len(changes) >= CHANGE_POLL_LIMIT:
+            self.load_tickets()
+        elif changes:
+            self._seq = changes[-1]['seq']
+            self._refresh_tickets({change['row_id'] for change in changes})
+
+    def _refresh_tickets(self, order_ids):
+        # Fetch just the tickets that changed; ones that come back missing
+        # were closed or have nothing for this station.
+        order_ids = list(order_ids)
+        tickets = {ticket['id']: ticket for ticket in
+                   App.get_running_app().db.get_active_orders(self._station_filter(), order_ids)}
+        for order_id in order_ids:
+            if order_id in tickets:
+                self.set_ticket(tickets[order_id])
+            else:
+                self.remove_ticket(order_id)
+        self._update_status()
+
+    def advance(self, order_id):
+        # The ORDER_STATUS_CHANGED event updates the ticket.
+        App.get_running_app().db.advance_order_status(order_id)
+
+    def _update_status(self):
+        self.ids.kitchen_status.text = "" if self._tickets else "No open tickets."
@@ -0,0 +1,45 @@
+from kivy.uix.screenmanager import Screen
+from kivy.properties import ObjectProperty, StringProperty
+from kivy.app import App
+from restaurant_pos.sessions import PIN_LENGTH
+
+
+class LockScreen(Screen):
+    """PIN pad shown when the terminal is locked or a cashier switches."""
+    pin = StringProperty("")
+    error_message = StringProperty("")
+    return_to = StringProperty("home")
+    # Id of the cashier whose screen was locked; only they go back to it.
+    locked_by = ObjectProperty(None, allownone=True)
+
+    def on_pre_enter(self):
+        self.pin = ""
+        self.error_message = ""
+
+    def press_digit(self, digit):
+        if len(self.pin) < PIN_LENGTH:
+            self.pin += digit
+        if len(self.pin) == PIN_LENGTH:
+            self.unlock()
+
+    def backspace(self):
+        self.pin = self.pin[:-1]
+
+    def unlock(self):
+        app = App.get_running_app()
+        user = app.sessions.unlock(self.pin)
+        self.pin = ""
+        if user is None:
+            self.error_message = "Wrong or expired PIN."
+            return
+        app.current_user = user
+        self.manager.current = self._destination(app, user)
+
+    def _destination(self, app, user):
+        if user['id'] != self.locked_by or self.return_to == 'home':
+            return 'home'
+        screen = self.manager.get_screen(self.return_to)
+        return self.return_to if app.has_permission(type(screen).__name__) else 'home'
+
+    def full_login(self):
+        self.manager.current = 'login'
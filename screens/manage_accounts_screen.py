@@ -5,33 +5,59 @@ from kivy.uix.button import Button
 from kivy.uix.popup import Popup
 from kivy.app import App
 from kivy.metrics import sp  # Import this for scalable font sizes
+from restaurant_pos import events
 
 class ManageAccountsScreen(Screen):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._loaded = False
+        self._rows = {}
+        App.get_running_app().db.events.subscribe((events.USER_ADDED, events.USER_DELETED), self._on_users_changed)
+
     def on_pre_enter(self):
-        self.display_users()
+        if not self._loaded:
+            self.display_users()
 
     def display_users(self):
         self.ids.user_list.clear_widgets()
+        self._rows = {}
+        self._loaded = True
         app = App.get_running_app()
         users = app.db.get_all_users()
 
         for user in users:
-            if user['role'] != 'super_admin':
-                box = BoxLayout(orientation='horizontal', size_hint_y=None, height=40, spacing=10)
+            self.add_user_row(user)
+
+    def add_user_row(self, user):
+        if user['role'] == 'super_admin':
+            return
+        box = BoxLayout(orientation='horizontal', size_hint_y=None, height=40, spacing=10)
+
+        box.add_widget(Label(text=user['username'], size_hint_x=0.4, font_size=sp(18)))
+        box.add_widget(Label(text=user['role'], size_hint_x=0.3, font_size=sp(18)))
 
-                box.add_widget(Label(text=user['username'], size_hint_x=0.4, font_size=sp(18)))
-                box.add_widget(Label(text=user['role'], size_hint_x=0.3, font_size=sp(18)))
+        delete_btn = Button(
+            text='Delete',
+            size_hint_x=0.3,
+            background_color=(1, 0, 0, 1),
+            font_size=sp(18)
+        )
+        delete_btn.bind(on_release=lambda btn, u=user: self.confirm_delete(u))
+        box.add_widget(delete_btn)
 
-                delete_btn = Button(
-                    text='Delete',
-                    size_hint_x=0.3,
-                    background_color=(1, 0, 0, 1),
-                    font_size=sp(18)
-                )
-                delete_btn.bind(on_release=lambda btn, u=user: self.confirm_delete(u))
-                box.add_widget(delete_btn)
+        self.ids.user_list.add_widget(box)
+        self._rows[user['id']] = box
 
-                self.ids.user_list.add_widget(box)
+    def _on_users_changed(self, changes):
+        if not self._loaded:
+            return
+        for change in changes:
+            if change.type == events.USER_ADDED:
+                self.add_user_row(change.data)
+            else:
+                row = self._rows.pop(change.data['id'], None)
+                if row is not None:
+                    self.ids.user_list.remove_widget(row)
 
     def confirm_delete(self, user):
         layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
@@ -53,4 +79,3 @@ class ManageAccountsScreen(Screen):
     def delete_user(self, user, popup):
         App.get_running_app().db.delete_user(user['id'])
         popup.dismiss()
-        self.display_users()
@@ -6,131 +6,142 @@ from kivy.uix.button import Button
 from kivy.metrics import dp, sp
 from kivy.app import App
 from kivy.logger import Logger
+from kivy.properties import NumericProperty, StringProperty
 from datetime import datetime, timedelta
-import csv
-import os
-
-class OrderHistoryScreen(Screen):
+from restaurant_pos.utils import utc_to_local
+from restaurant_pos.exporter import ExportJob
+from restaurant_pos import events
+from restaurant_pos.db_executor import LoadingMixin
+
+PAGE_SIZE = 50
+# Fetch the next page once the user is within this fraction of the bottom.
+PREFETCH_THRESHOLD = 0.15
+EXPORT_FORMAT_CHOICES = {'CSV': 'csv', 'JSON Lines': 'jsonl', 'Excel': 'xlsx'}
+
+
+class OrderHistoryRow(BoxLayout):
+    """RecycleView row for one order; its height is set per data item."""
+    order_id = NumericProperty(0)
+    header = StringProperty("")
+    lines = StringProperty("")
+    line_count = NumericProperty(0)
+    total = StringProperty("")
+
+
+class OrderHistoryScreen(LoadingMixin, Screen):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.filter_period = 'Show All'
+        self._cursor = None
+        self._export_job = None
+        self._range = None
+        self._dirty = True
+        App.get_running_app().db.events.subscribe((events.ORDER_CREATED, events.ORDERS_CLEARED),
+                                                  self._on_orders_changed)
 
     def on_pre_enter(self):
-        self.load_order_history()
+        # Reload only when orders changed or a relative period (e.g. Today) has moved on.
+        if self._dirty or self._period_range(self.filter_period) != self._range:
+            self.load_order_history(self.filter_period)
 
-    def load_order_history(self, filter_period='Show All'):
-        container = self.ids.order_history_container
-        container.clear_widgets()
-        db = App.get_running_app().db
+    def _on_orders_changed(self, changes):
+        if self.manager is not None and self.manager.current == self.name:
+            self.load_order_history(self.filter_period)
+        else:
+            self._dirty = True
 
-        try:
-            orders = db.get_all_orders()
-
-            # Filter by period if needed
-            if filter_period != 'Show All':
-                if filter_period == 'Today':
-                    orders = [o for o in orders if self._is_today(o['created_at'])]
-                elif filter_period == 'Last 7 Days':
-                    orders = [o for o in orders if self._is_within_days(o['created_at'], 7)]
-                elif filter_period == 'This Month':
-                    orders = [o for o in orders if self._is_this_month(o['created_at'])]
-
-            if not orders:
-                no_data_label = Label(
-                    text="No order history found.",
-                    font_size=sp(20),
-                    halign='center',
-                    valign='middle',
-                    size_hint_y=None,
-                    height=dp(100),
-                    color=(0.5, 0.1, 0.1, 1)
-                )
-                no_data_label.bind(size=no_data_label.setter('text_size'))
-                container.add_widget(no_data_label)
-
-            for order in orders:
-                order_id = order['id']
-                timestamp = str(order.get('created_at', 'Unknown'))
-                user = order.get('user_name', 'Unknown')
-                order_items = db.get_items_by_order_id(order_id)
-
-                total = sum(item['price'] * item['quantity'] for item in order_items)
-
-                order_box = BoxLayout(orientation='vertical', size_hint_y=None, padding=dp(5), spacing=dp(5))
-                order_box.bind(minimum_height=order_box.setter('height'))
-
-                order_box.add_widget(Label(
-                    text=f"[b]Order #{order_id}[/b] | {timestamp} | {user}",
-                    markup=True,
-                    size_hint_y=None,
-                    height=dp(30),
-                    color=(0, 0, 0, 1),
-                    font_size=sp(16)
-                ))
-
-                for item in order_items:
-                    order_box.add_widget(Label(
-                        text=f"{item['name']} x{item['quantity']} - ${item['price']:.2f}",
-                        size_hint_y=None,
-                        height=dp(25),
-                        color=(0.2, 0.2, 0.2, 1),
-                        font_size=sp(14)
-                    ))
-
-                order_box.add_widget(Label(
-                    text=f"[i]Total: ${total:.2f}[/i]",
-                    markup=True,
-                    size_hint_y=None,
-                    height=dp(25),
-                    color=(0.1, 0.4, 0.1, 1),
-                    font_size=sp(14)
-                ))
-
-                order_box.add_widget(Label(
-                    text="-" * 50,
-                    size_hint_y=None,
-                    height=dp(10),
-                    color=(0.5, 0.5, 0.5, 1),
-                    font_size=sp(12)
-                ))
-
-                container.add_widget(order_box)
-
-        except Exception as e:
-            container.add_widget(Label(text=f"Error loading order history: {str(e)}", font_size=sp(16)))
+    def load_order_history(self, filter_period='Show All'):
+        """Reset the list and show the first page for ``filter_period``."""
+        self.filter_period = filter_period
+        self._range = self._period_range(filter_period)
+        self._dirty = False
+        self._cursor = None
+        view = self.ids.order_history_view
+        view.data = []
+        view.scroll_y = 1
+        self._load_next_page(first=True)
+
+    def _load_next_page(self, first=False):
+        if (self.loading and not first) or (self._cursor is None and not first):
+            return
+        status = self.ids.order_history_status
+        if first:
+            status.text = "Loading..."
+        start, end = self._range
+
+        def on_done(page):
+            orders, self._cursor = page
+            self.ids.order_history_view.data.extend(self._row_data(order) for order in orders)
+            status.text = "No order history found." if first and not orders else ""
+
+        def on_error(e):
+            status.text = f"Error loading order history: {str(e)}"
             Logger.error(f"Error loading order history: {e}")
 
-    def export_order_history_to_csv(self):
-        db = App.get_running_app().db
-        try:
-            orders = db.get_all_orders()
-            if not orders:
-                return
-
-            folder_path = 'data/excel_receipts'
-            if not os.path.exists(folder_path):
-                os.makedirs(folder_path)
-
-            filename = os.path.join(folder_path, 'order_history.csv')
-
-            print("Exported CSV path:", filename)
-
-            with open(filename, mode='w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(['Order ID', 'Timestamp', 'User', 'Item Name', 'Quantity', 'Price'])
-
-                for order in orders:
-                    items = db.get_items_by_order_id(order['id'])
-                    for item in items:
-                        writer.writerow([
-                            order['id'],
-                            order['created_at'],
-                            order.get('user_name', 'Unknown'),
-                            item['name'],
-                            item['quantity'],
-                            item['price']
-                        ])
-            print(f"Exported to {filename}")
-
-        except Exception as e:
-            Logger.error(f"CSV Export Failed: {e}")
+        # Keyed so a page for an old filter is dropped if the filter changed meanwhile.
+        self.run_db(App.get_running_app().db.get_order_history_page, self._cursor, PAGE_SIZE, start, end,
+                    on_done=on_done, on_error=on_error, key='history')
+
+    def on_history_scroll(self, view, scroll_y):
+        # scroll_y runs from 1 at the top to 0 at the bottom.
+        if scroll_y <= PREFETCH_THRESHOLD and view.data:
+            self._load_next_page()
+
+    def _row_data(self, order):
+        items = order['items']
+        return {
+            'order_id': order['id'],
+            'header': f"[b]Order #{order['id']}[/b] | {self._format_timestamp(order.get('created_at'))} | "
+                      f"{order.get('user_name', 'Unknown')}",
+            'lines': "\n".join(f"{item['name']} x{item['quantity']} - ${item['price']:.2f}" for item in items),
+            'line_count': len(items),
+            'total': f"[i]Total: ${order['total']:.2f}[/i]",
+            # header + lines + total + separator, plus the row's padding and spacing
+            'height': dp(30) + dp(25) * len(items) + dp(25) + dp(10) + dp(5) * 5
+        }
+
+    def export_order_history(self):
+        """Export the currently filtered history in the chosen format on a worker thread."""
+        if self._export_job is not None:
+            return
+        app = App.get_running_app()
+        start, end = self._range
+        button = self.ids.export_button
+        button.disabled = True
+        button.text = 'Exporting...'
+
+        def on_progress(done, total):
+            button.text = f"Exporting... {done * 100 // total}%" if total else 'Exporting...'
+
+        def on_finished(message):
+            self._export_job = None
+            button.disabled = False
+            button.text = 'Export Orders'
+            self.show_message('Export', message)
+
+        self._export_job = ExportJob(
+            app.db,
+            fmt=EXPORT_FORMAT_CHOICES[self.ids.export_format.text],
+            start=start,
+            end=end,
+            compress=self.ids.export_gzip.state == 'down',
+            on_progress=on_progress,
+            on_done=lambda path: on_finished(f"Exported to {path}"),
+            on_error=lambda e: on_finished(f"Export failed: {e}")
+        ).begin()
+
+    def reprint(self, order_id):
+        # Sent straight from the receipt journal; printing happens on the spooler thread.
+        receipts = App.get_running_app().receipts
+        if receipts is None:
+            self.show_message('Reprint', "Receipt printing is not ready yet.")
+            return
+        receipts.reprint(order_id)
+
+    def show_message(self, title, message):
+        popup = Popup(title=title, content=Label(text=message, font_size=sp(16)), size_hint=(0.75, 0.3))
+        popup.open()
 
     def confirm_clear_order_history(self):
         content = BoxLayout(orientation='vertical', spacing=10, padding=10)
@@ -149,34 +160,34 @@ class OrderHistoryScreen(Screen):
         popup.open()
 
     def _clear_orders_and_refresh(self, popup):
-        try:
-            App.get_running_app().db.clear_all_orders()
-            popup.dismiss()
-            self.load_order_history()
-        except Exception as e:
-            Logger.error(f"Clear history failed: {e}")
+        # The ORDERS_CLEARED event reloads the list once the delete has committed.
+        popup.dismiss()
+        self.run_db(App.get_running_app().db.clear_all_orders,
+                    on_error=lambda e: self.show_message('Error', f"Clear history failed: {e}"))
 
     def filter_order_history(self, value):
         self.load_order_history(filter_period=value)
 
-    def _is_today(self, ts):
-        try:
-            date = datetime.fromisoformat(str(ts))
-            return date.date() == datetime.today().date()
-        except:
-            return False
-
-    def _is_within_days(self, ts, days):
-        try:
-            date = datetime.fromisoformat(str(ts))
-            return datetime.today() - date <= timedelta(days=days)
-        except:
-            return False
-
-    def _is_this_month(self, ts):
+    def _period_range(self, filter_period):
+        """Local-time [start, end) bounds for a filter; the database converts them to UTC.
+
+        Bounds fall on midnight, so the range only changes when the day does
+        and on_pre_enter can reuse the loaded pages until then.
+        """
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        if filter_period == 'Today':
+            return midnight, midnight + timedelta(days=1)
+        if filter_period == 'Last 7 Days':
+            # Today and the six days before it.
+            return midnight - timedelta(days=6), None
+        if filter_period == 'This Month':
+            month_start = midnight.replace(day=1)
+            next_month = (month_start + timedelta(days=32)).replace(day=1)
+            return month_start, next_month
+        return None, None
+
+    def _format_timestamp(self, ts):
         try:
-            date = datetime.fromisoformat(str(ts))
-            now = datetime.today()
-            return date.month == now.month and date.year == now.year
-        except:
-            return False
+            return utc_to_local(ts).strftime('%Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            return str(ts or 'Unknown')
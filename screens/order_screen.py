@@ -5,30 +5,9 @@ from kivy.uix.label import Label
 from kivy.metrics import dp, sp  # ✅ Added sp
 from kivy.app import App
 from kivy.properties import DictProperty, NumericProperty, StringProperty
-from datetime import datetime
-
-
-class OrderItemBox(BoxLayout):
-    def __init__(self, item, quantity, on_remove, **kwargs):
-        super().__init__(**kwargs)
-        self.orientation = 'horizontal'
-        self.size_hint_y = None
-        self.height = dp(50)
-        self.spacing = dp(10)
-        self.padding = [dp(5), 0]
-
-        self.add_widget(Label(text=item['name'], size_hint_x=0.4, font_size=sp(16)))
-        self.add_widget(Label(text=f"x{quantity}", size_hint_x=0.2, font_size=sp(16)))
-        self.add_widget(Label(text=f"${item['price'] * quantity:.2f}", size_hint_x=0.3, font_size=sp(16)))
-
-        remove_btn = Button(
-            text='Remove',
-            size_hint_x=0.1,
-            size_hint_y=0.8,
-            font_size=sp(14),
-            on_press=lambda x: on_remove(item['id'])
-        )
-        self.add_widget(remove_btn)
+from restaurant_pos import events
+from restaurant_pos.cart import Cart
+from restaurant_pos.widget_pool import PoolButton, WidgetPool
 
 
 class OrderScreen(Screen):
@@ -38,125 +17,199 @@ class OrderScreen(Screen):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.current_order = []
+        self.cart = None
+        self._carts = {}
+        self._summary_rows = {}
+        self._item_buttons = {}
+        self._category_pool = WidgetPool(self.create_category_button)
+        self._item_pool = WidgetPool(self.create_item_button)
+        self._items_message = Label(font_size=sp(16))
+        self._menu_dirty = True
+        self._stock_dirty = False
+        bus = App.get_running_app().db.events
+        bus.subscribe(events.MENU_EVENTS, self._on_menu_changed)
+        bus.subscribe((events.STOCK_CHANGED, events.INVENTORY_CHANGED), self._on_stock_changed)
         self.bind(on_pre_enter=self._load_data)
 
     def _load_data(self, *args):
-        self.current_order = []
-        self.refresh_categories()
-        self.update_order_summary()
+        self._select_cart()
+        if self._menu_dirty:
+            self.refresh_categories()
+        elif self._stock_dirty:
+            self.refresh_stock()
+
+    def _select_cart(self):
+        """Show the signed-in cashier's cart; each keeps theirs across quick switches."""
+        app = App.get_running_app()
+        user_id = app.current_user['id'] if app.current_user else None
+        for other in list(self._carts):
+            if other != user_id and not app.sessions.is_active(other):
+                del self._carts[other]
+        cart = self._carts.get(user_id)
+        if cart is None:
+            cart = self._carts[user_id] = Cart()
+            cart.bind(on_change=self._on_cart_change, total_cents=self._on_cart_total)
+        if cart is not self.cart:
+            self.cart = cart
+            self.update_order_summary()
+
+    def _is_showing(self):
+        return self.manager is not None and self.manager.current == self.name
+
+    def _on_menu_changed(self, changes):
+        # Menu edits happen on other screens, so just rebuild on the next visit.
+        if self._is_showing():
+            self.refresh_categories()
+        else:
+            self._menu_dirty = True
+
+    def _on_stock_changed(self, changes):
+        if self._is_showing():
+            self.refresh_stock()
+        else:
+            self._stock_dirty = True
 
     def load_categories(self):
         categories_container = self.ids.categories_container
-        categories_container.clear_widgets()
 
         try:
-            categories = App.get_running_app().db.get_categories()
+            categories = App.get_running_app().db.catalog.get_categories()
+            self._category_pool.fill(categories_container, categories, self.bind_category_button)
             if not categories:
                 self.ids.current_category_label.text = ""
+                self._item_pool.fill(self.ids.items_container, [], self.bind_item_button)
+                self._item_buttons = {}
                 return
 
-            for cat in categories:
-                btn = self.create_category_button(cat)
-                categories_container.add_widget(btn)
-
             self.show_category_items(categories[0])
         except Exception as e:
             print(f"Error loading categories: {e}")
             self.ids.current_category_label.text = "Error loading categories"
 
-    def create_category_button(self, category):
-        return Button(
-            text=category['name'],
+    def create_category_button(self):
+        return PoolButton(
             size_hint_y=None,
             height=dp(50),
             font_size=sp(16),
-            background_color=(0.2, 0.6, 0.8, 1),
-            on_press=lambda x, c=category: self.show_category_items(c)
+            background_color=(0.2, 0.6, 0.8, 1)
         )
 
+    def bind_category_button(self, btn, category):
+        btn.text = category['name']
+        btn.callback = lambda c=category: self.show_category_items(c)
+
     def show_category_items(self, category):
         self.current_category = category['id']
         self.current_category_name = category['name']
         items_container = self.ids.items_container
-        items_container.clear_widgets()
 
         try:
-            items = App.get_running_app().db.get_menu_items_by_category(category['id'])
+            items = App.get_running_app().db.catalog.get_items(category['id'])
+            buttons = self._item_pool.fill(items_container, items, self.bind_item_button)
+            self._item_buttons = {item['id']: btn for item, btn in zip(items, buttons)}
             if not items:
-                items_container.add_widget(Label(text="No items in this category", font_size=sp(16)))
-                return
-
-            for item in items:
-                items_container.add_widget(self.create_item_button(item))
+                self._show_items_message("No items in this category")
 
         except Exception as e:
             print(f"Error loading items: {e}")
-            items_container.add_widget(Label(text="Error loading items", font_size=sp(16)))
+            self._item_buttons = {}
+            self._item_pool.fill(items_container, [], self.bind_item_button)
+            self._show_items_message("Error loading items")
 
-    def create_item_button(self, item):
-        db = App.get_running_app().db
-        inventory = db.get_inventory_by_menu_item_id(item['id'])
-        out_of_stock = inventory is None or inventory.get('quantity', 0) <= 0
+    def _show_items_message(self, text):
+        self._items_message.text = text
+        self.ids.items_container.add_widget(self._items_message)
 
-        return Button(
-            text=f"{item['name']} - Out of Stock" if out_of_stock else f"{item['name']} - ${item['price']:.2f}",
+    def create_item_button(self):
+        return PoolButton(
             size_hint_y=None,
             height=dp(50),
-            font_size=sp(16),
-            background_color=(0.7, 0.7, 0.7, 1) if out_of_stock else (0.3, 0.6, 1, 1),
-            disabled=out_of_stock,
-            on_press=lambda x, i=item: self.add_to_order(i['name'], i['price'])
+            font_size=sp(16)
         )
 
-    def add_to_order(self, item_name, item_price):
-        db = App.get_running_app().db
-        menu_item = db.get_menu_item_by_name(item_name)
-        if not menu_item:
-            raise ValueError(f"Menu item '{item_name}' not found")
-
-        for entry in self.current_order:
-            if entry['item']['id'] == menu_item['id']:
-                entry['quantity'] += 1
-                self.update_order_summary()
+    def bind_item_button(self, btn, item):
+        btn.callback = lambda i=item: self.add_to_order(i['id'])
+        self.style_item_button(btn, item)
+
+    def style_item_button(self, btn, item):
+        out_of_stock = not App.get_running_app().db.catalog.in_stock(item)
+        btn.text = f"{item['name']} - Out of Stock" if out_of_stock else f"{item['name']} - ${item['price']:.2f}"
+        btn.background_color = (0.7, 0.7, 0.7, 1) if out_of_stock else (0.3, 0.6, 1, 1)
+        btn.disabled = out_of_stock
+
+    def refresh_stock(self):
+        """Restyle the visible item buttons from the catalog's current stock."""
+        self._stock_dirty = False
+        catalog = App.get_running_app().db.catalog
+        for menu_item_id, btn in self._item_buttons.items():
+            item = catalog.get_item(menu_item_id)
+            if item is None:
+                # The menu changed underneath us; rebuild from the snapshot.
+                self.refresh_categories()
                 return
+            self.style_item_button(btn, item)
 
-        self.current_order.append({'item': menu_item, 'quantity': 1})
-        self.update_order_summary()
-
-    def update_order_summary(self):
-        summary_box = self.ids.order_summary
-        total_label = self.ids.total_label
+    def add_to_order(self, menu_item_id):
+        menu_item = App.get_running_app().db.catalog.get_item(menu_item_id)
+        if not menu_item:
+            raise ValueError(f"Menu item #{menu_item_id} not found")
+        self.cart.add(menu_item)
 
-        summary_box.clear_widgets()
-        total = 0.0
+    # --- Order summary: one row per cart line, patched as the cart changes ---
 
-        for entry in self.current_order:
-            item = entry['item']
-            quantity = entry['quantity']
-            item_total = item['price'] * quantity
+    def _on_cart_change(self, cart, action, menu_item_id, line):
+        if cart is not self.cart:
+            return
+        summary_box = self.ids.order_summary
+        if action == 'cleared':
+            summary_box.clear_widgets()
+            self._summary_rows = {}
+        elif action == 'added':
+            row = self._create_summary_row(menu_item_id, line)
+            self._summary_rows[menu_item_id] = row
+            summary_box.add_widget(row)
+        elif action == 'updated':
+            self._update_summary_row(self._summary_rows[menu_item_id], line)
+        elif action == 'removed':
+            summary_box.remove_widget(self._summary_rows.pop(menu_item_id))
+
+    def _on_cart_total(self, cart, total_cents):
+        if cart is not self.cart:
+            return
+        self.ids.total_label.text = f"Total: ${total_cents / 100:.2f}"
 
-            order_item_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(40), spacing=dp(10))
+    def _create_summary_row(self, menu_item_id, line):
+        row = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(40), spacing=dp(10))
 
-            order_item_box.add_widget(Label(text=str(item['name']), size_hint_x=0.3, color=(0, 0, 0, 1), font_size=sp(15)))
-            order_item_box.add_widget(Label(text=f"x{quantity}", size_hint_x=0.2, color=(0, 0, 0, 1), font_size=sp(15)))
-            order_item_box.add_widget(Label(text=f"${item_total:.2f}", size_hint_x=0.2, color=(0, 0, 0, 1), font_size=sp(15)))
+        row.add_widget(Label(text=str(line.item['name']), size_hint_x=0.3, color=(0, 0, 0, 1), font_size=sp(15)))
+        row.quantity_label = Label(size_hint_x=0.2, color=(0, 0, 0, 1), font_size=sp(15))
+        row.total_label = Label(size_hint_x=0.2, color=(0, 0, 0, 1), font_size=sp(15))
+        row.add_widget(row.quantity_label)
+        row.add_widget(row.total_label)
 
-            dec_btn = Button(text="-", size_hint_x=0.1, font_size=sp(14),
-                             on_press=lambda x, item_id=item['id']: self.decrease_quantity(item_id))
-            del_btn = Button(text="Delete", size_hint_x=0.2, font_size=sp(14),
-                             on_press=lambda x, item_id=item['id']: self.remove_item_from_order(item_id))
+        dec_btn = Button(text="-", size_hint_x=0.1, font_size=sp(14),
+                         on_press=lambda x: self.decrease_quantity(menu_item_id))
+        del_btn = Button(text="Delete", size_hint_x=0.2, font_size=sp(14),
+                         on_press=lambda x: self.remove_item_from_order(menu_item_id))
 
-            order_item_box.add_widget(dec_btn)
-            order_item_box.add_widget(del_btn)
+        row.add_widget(dec_btn)
+        row.add_widget(del_btn)
+        self._update_summary_row(row, line)
+        return row
 
-            summary_box.add_widget(order_item_box)
-            total += item_total
+    def _update_summary_row(self, row, line):
+        row.quantity_label.text = f"x{line.quantity}"
+        row.total_label.text = f"${line.total_cents / 100:.2f}"
 
-        total_label.text = f"Total: ${round(total, 2):.2f}"
+    def update_order_summary(self):
+        """Rebuild the whole summary from the cart (normally it is patched row by row)."""
+        self._on_cart_change(self.cart, 'cleared', None, None)
+        for line in self.cart:
+            self._on_cart_change(self.cart, 'added', line.item['id'], line)
+        self._on_cart_total(self.cart, self.cart.total_cents)
 
     def submit_order(self):
-        if not self.current_order:
+        if not self.cart:
             self.show_message("Error", "Cannot submit empty order!")
             return
 
@@ -167,67 +220,37 @@ class OrderScreen(Screen):
             if not hasattr(app, 'current_user') or not app.current_user:
                 raise ValueError("Please login to submit orders")
 
-            for item in self.current_order:
-                menu_item_id = item['item']['id']
-                requested_qty = item['quantity']
-                inventory = db.get_inventory_by_menu_item_id(menu_item_id)
-
-                if not inventory:
-                    self.show_message("Error", f"No inventory record for {item['item']['name']}")
-                    return
-
-                available_qty = inventory.get('quantity', 0)
-                if available_qty < requested_qty:
-                    self.show_message("Out of Stock",
-                        f"Not enough stock for '{item['item']['name']}'. Available: {available_qty}, Requested: {requested_qty}")
-                    return
-
             user_id = app.current_user['id']
-            order_id = db.create_order(user_id)
+            order_id, shortages = db.submit_order(user_id, self.cart.order_lines())
+
+            if shortages:
+                self.show_message("Out of Stock", "\n".join(
+                    f"No inventory record for {short['name']}" if short['available'] is None else
+                    f"Not enough stock for '{short['name']}'. "
+                    f"Available: {short['available']}, Requested: {short['requested']}"
+                    for short in shortages
+                ))
+                return
 
             if not order_id:
                 self.show_message("Error", "Order creation failed (no ID returned)")
                 return
 
-            for item in self.current_order:
-                menu_item = item['item']
-                quantity = item['quantity']
-                db.add_item_to_order(order_id=order_id, menu_item_id=menu_item['id'], quantity=quantity)
-                db.reduce_inventory_by_menu_item_id(menu_item['id'], quantity)
-
             self.print_receipt(order_id)
-            self.current_order = []
-            self.update_order_summary()
+            self.cart.clear()
             self.show_message("Success", f"Order #{order_id} submitted!")
 
         except Exception as e:
             self.show_message("Error", f"Failed to submit order: {str(e)}")
 
-        self.refresh_categories()
-
     def print_receipt(self, order_id):
-        print(f"Printing receipt for order #{order_id}")
-        receipt_lines = [
-            f"Order #{order_id}",
-            f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-            "----------------------------"
-        ]
-
-        for item in self.current_order:
-            receipt_lines.append(
-                f"{item['item']['name']} x{item['quantity']} @ ${item['item']['price']:.2f}"
-            )
-
-        receipt_lines.extend([
-            "----------------------------",
-            f"TOTAL: ${self.calculate_order_total():.2f}",
-            "Thank you!"
-        ])
-
-        print("\n".join(receipt_lines))
+        # Rendered and spooled in the background; never waits on the printer.
+        receipts = App.get_running_app().receipts
+        if receipts is not None:
+            receipts.print_order(order_id)
 
     def calculate_order_total(self):
-        return sum(item['item']['price'] * item['quantity'] for item in self.current_order)
+        return self.cart.total
 
     def show_message(self, title, message):
         from kivy.uix.popup import Popup
@@ -238,17 +261,12 @@ class OrderScreen(Screen):
         ).open()
 
     def remove_item_from_order(self, item_id):
-        self.current_order = [entry for entry in self.current_order if entry['item']['id'] != item_id]
-        self.update_order_summary()
+        self.cart.remove(item_id)
 
     def decrease_quantity(self, item_id):
-        for entry in self.current_order:
-            if entry['item']['id'] == item_id:
-                entry['quantity'] -= 1
-                if entry['quantity'] <= 0:
-                    self.remove_item_from_order(item_id)
-                break
-        self.update_order_summary()
+        self.cart.decrement(item_id)
 
     def refresh_categories(self):
+        self._menu_dirty = False
+        self._stock_dirty = False
         self.load_categories()
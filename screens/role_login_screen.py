@@ -0,0 +1,38 @@
+from kivy.uix.screenmanager import Screen
+from kivy.properties import StringProperty
+from kivy.app import App
+from restaurant_pos.db_executor import LoadingMixin
+
+
+class RoleLoginScreen(LoadingMixin, Screen):
+    """Password login that only admits accounts with ``role``.
+
+    Subclasses set ``role``; their kv rule provides ``username`` and
+    ``password`` inputs and shows ``error_message``.
+    """
+    role = None
+    error_message = StringProperty("")
+
+    def login(self):
+        username = self.ids.username.text.strip()
+        password = self.ids.password.text.strip()
+        if not username or not password:
+            self.error_message = "Username and password are required"
+            return
+        if self.loading:
+            return
+        # bcrypt takes a noticeable fraction of a second, so check off the UI thread.
+        self.run_db(App.get_running_app().db.auth.authenticate, username, password, self.role,
+                    on_done=self._on_checked, on_error=lambda e: self.show_error(f"Login failed: {e}"))
+
+    def _on_checked(self, result):
+        user, error = result
+        if user is None:
+            self.show_error(error)
+            return
+        self.error_message = ""
+        App.get_running_app().sign_in(user)
+        self.manager.current = 'home'
+
+    def show_error(self, message):
+        self.error_message = message
@@ -0,0 +1,126 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from kivy.logger import Logger
+
+PIN_LENGTH = 4
+# A session ends this long after the full login, or after going unused for
+# IDLE_TIMEOUT; the cashier then signs in with their password again.
+SESSION_LIFETIME = 12 * 60 * 60
+IDLE_TIMEOUT = 30 * 60
+# Lock the terminal after this long without a touch.
+AUTO_LOCK_AFTER = 2 * 60
+# Wrong PINs in a row before every session is dropped.
+MAX_PIN_ATTEMPTS = 5
+
+
+class Session:
+    __slots__ = ('user', 'key', 'started', 'last_active')
+
+    def __init__(self, user, key, now):
+        self.user = user
+        self.key = key
+        self.started = now
+        self.last_active = now
+
+
+class SessionManager:
+    """Quick-switch PIN sessions for cashiers sharing a terminal.
+
+    A full password login starts a session and hands the cashier a short
+    random PIN. PINs are never stored: the table is keyed by an HMAC of the
+    PIN under a key generated at startup, so ``unlock`` is one hash and one
+    dict lookup. Sessions live only in memory and end on logout, after
+    SESSION_LIFETIME, or after IDLE_TIMEOUT without use. Too many wrong PINs
+    in a row drop every session so a PIN can't be guessed.
+    """
+
+    def __init__(self, lifetime=SESSION_LIFETIME, idle_timeout=IDLE_TIMEOUT,
+                 auto_lock_after=AUTO_LOCK_AFTER, clock=time.monotonic):
+        self.lifetime = lifetime
+        self.idle_timeout = idle_timeout
+        self.auto_lock_after = auto_lock_after
+        self._clock = clock
+        self._secret = secrets.token_bytes(32)
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._by_user = {}
+        self._failures = 0
+
+    def configure(self, settings):
+        try:
+            self.idle_timeout = float(settings.get('session_idle_minutes', self.idle_timeout / 60)) * 60
+            self.auto_lock_after = float(settings.get('auto_lock_seconds', self.auto_lock_after))
+        except (TypeError, ValueError):
+            Logger.error("Sessions: invalid session_idle_minutes or auto_lock_seconds in settings")
+
+    def _key(self, pin):
+        return hmac.new(self._secret, pin.encode(), hashlib.sha256).digest()
+
+    def start(self, user):
+        """Start (or restart) ``user``'s session and return their new PIN."""
+        with self._lock:
+            self._end(user['id'])
+            while True:
+                pin = ''.join(secrets.choice('0123456789') for _ in range(PIN_LENGTH))
+                key = self._key(pin)
+                if key not in self._by_key:
+                    break
+            session = Session(user, key, self._clock())
+            self._by_key[key] = session
+            self._by_user[user['id']] = session
+        return pin
+
+    def unlock(self, pin):
+        """Return the user whose PIN this is, or None."""
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            session = self._by_key.get(self._key(pin))
+            if session is None:
+                self._failures += 1
+                if self._failures >= MAX_PIN_ATTEMPTS:
+                    self._by_key.clear()
+                    self._by_user.clear()
+                    self._failures = 0
+                return None
+            self._failures = 0
+            session.last_active = now
+            return session.user
+
+    def touch(self, user_id):
+        with self._lock:
+            session = self._by_user.get(user_id)
+            if session is not None:
+                session.last_active = self._clock()
+
+    def idle_for(self, user_id):
+        with self._lock:
+            session = self._by_user.get(user_id)
+            return None if session is None else self._clock() - session.last_active
+
+    def is_active(self, user_id):
+        with self._lock:
+            self._expire(self._clock())
+            return user_id in self._by_user
+
+    def active_users(self):
+        with self._lock:
+            self._expire(self._clock())
+            return [session.user for session in self._by_user.values()]
+
+    def end(self, user_id):
+        with self._lock:
+            self._end(user_id)
+
+    def _end(self, user_id):
+        session = self._by_user.pop(user_id, None)
+        if session is not None:
+            del self._by_key[session.key]
+
+    def _expire(self, now):
+        for user_id, session in list(self._by_user.items()):
+            if now - session.started > self.lifetime or now - session.last_active > self.idle_timeout:
+                self._end(user_id)
@@ -1,5 +1,37 @@
 import bcrypt
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
 
-def hash_password(password):
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+# Format SQLite uses for CURRENT_TIMESTAMP, which is always UTC.
+SQLITE_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+def hash_password(password, rounds=12):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+def to_utc_timestamp(value):
+    """Convert a datetime (naive means local time) to a UTC CURRENT_TIMESTAMP string.
+
+    Strings are assumed to already be UTC timestamps and are passed through.
+    """
+    if isinstance(value, str):
+        return value
+    return value.astimezone(timezone.utc).strftime(SQLITE_TIMESTAMP_FORMAT)
+
+def utc_to_local(timestamp):
+    """Parse a stored UTC timestamp into a naive local datetime."""
+    utc = datetime.strptime(str(timestamp)[:19], SQLITE_TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    return utc.astimezone().replace(tzinfo=None)
+
+def to_cents(amount):
+    """Convert a price in currency units to integer cents, rounding half away from zero.
+
+    Rounds the decimal value as written, so 1.005 gives 101. SQLite's
+    ROUND(price * 100) works on the binary float and gives 100, which is why
+    SQL must use the to_cents function from register_sql_functions instead.
+    """
+    return int(Decimal(str(amount)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def register_sql_functions(conn):
+    """Make ``to_cents(price)`` available to SQL on ``conn``."""
+    conn.create_function('to_cents', 1, lambda amount: None if amount is None else to_cents(amount),
+                         deterministic=True)
@@ -0,0 +1,70 @@
+from kivy.uix.button import Button
+
+
+class PoolButton(Button):
+    """Button whose press handler can be swapped each time it is reused."""
+
+    def __init__(self, **kwargs):
+        self.callback = None
+        super().__init__(**kwargs)
+
+    def on_press(self):
+        if self.callback is not None:
+            self.callback()
+
+
+class WidgetPool:
+    """Hands out widgets from ``factory`` and takes them back for reuse.
+
+    Building widgets (and their label textures) is the slowest thing the
+    tablets do, so grids keep their widgets and just rebind text, colour,
+    disabled state and callbacks when the data changes. The pool only
+    calls ``factory`` when every widget it owns is in use.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._free = []
+        self._owned = set()
+        self.created = 0
+
+    def acquire(self):
+        if self._free:
+            return self._free.pop()
+        widget = self._factory()
+        self._owned.add(widget)
+        self.created += 1
+        return widget
+
+    def release(self, widget):
+        if widget.parent is not None:
+            widget.parent.remove_widget(widget)
+        self._free.append(widget)
+
+    def fill(self, container, items, bind):
+        """Show one pooled widget per item in ``container``, in order.
+
+        Pooled widgets already in the container are rebound in place with
+        ``bind(widget, item)``; extras go back to the pool and any shortfall
+        is acquired from it. Widgets the pool doesn't own are removed.
+        Returns the widgets in display order.
+        """
+        # Kivy keeps children last-to-first.
+        current = [child for child in reversed(container.children)]
+        for child in current:
+            if child not in self._owned:
+                container.remove_widget(child)
+        current = [child for child in current if child in self._owned]
+
+        widgets = []
+        for index, item in enumerate(items):
+            if index < len(current):
+                widget = current[index]
+            else:
+                widget = self.acquire()
+                container.add_widget(widget)
+            bind(widget, item)
+            widgets.append(widget)
+        for widget in current[len(widgets):]:
+            self.release(widget)
+        return widgets